@@ -4,10 +4,14 @@ Grid actions.
 Should be used in replay and undo features.
 """
 
+from array import array
 from dataclasses import dataclass, field
-from layer_util import Layer
+from layer_util import Layer, get_layers
 from grid import Grid
 
+# Coordinates need 4 bytes each, which array's "I" is not guaranteed to give.
+COORD_TYPECODE = "I" if array("I").itemsize >= 4 else "L"
+
 @dataclass
 class PaintStep:
 
@@ -45,3 +49,62 @@ class PaintAction:
 
     def add_step(self, step: PaintStep):
         self.steps.append(step)
+
+
+class CompactPaintAction:
+    """
+    A PaintAction which stores its steps as packed arrays rather than
+    PaintStep objects.
+    coords holds x0, y0, x1, y1, ... and layers holds the index of the
+    layer affected by each step, so each step costs 9 bytes.
+    """
+
+    __slots__ = ("coords", "layers", "is_special")
+
+    def __init__(self, steps: list[PaintStep]=(), is_special: bool=False) -> None:
+        self.coords = array(COORD_TYPECODE)
+        self.layers = bytearray()
+        self.is_special = is_special
+        for step in steps:
+            self.add_step(step)
+
+    @classmethod
+    def from_action(cls, action: PaintAction) -> CompactPaintAction:
+        return cls(action.steps, action.is_special)
+
+    def __len__(self) -> int:
+        return len(self.layers)
+
+    @property
+    def steps(self) -> list[PaintStep]:
+        """The steps of this action, rebuilt as PaintSteps."""
+        layers = get_layers()
+        return [
+            PaintStep((x, y), layers[index])
+            for x, y, index in zip(self.coords[::2], self.coords[1::2], self.layers)
+        ]
+
+    def undo_apply(self, grid: Grid):
+        if self.is_special:
+            grid.special()
+            return
+        layers = get_layers()
+        grid.apply_steps(
+            self.coords[::2], self.coords[1::2], [layers[index] for index in self.layers], erase=True
+        )
+
+    def redo_apply(self, grid: Grid):
+        if self.is_special:
+            grid.special()
+            return
+        layers = get_layers()
+        grid.apply_steps(self.coords[::2], self.coords[1::2], [layers[index] for index in self.layers])
+
+    def add_step(self, step: PaintStep):
+        self.add(step.affected_grid_square[0], step.affected_grid_square[1], step.affected_layer)
+
+    def add(self, x: int, y: int, layer: Layer):
+        """Add a step applying layer to square (x, y), without creating a PaintStep."""
+        self.coords.append(x)
+        self.coords.append(y)
+        self.layers.append(layer.index)
@@ -3,6 +3,8 @@
 """
 
 from __future__ import annotations
+import unittest
+from typing import Iterator
 from data_structures.set_adt import Set
 
 class BSet(Set[int]):
@@ -36,14 +38,19 @@ class BSet(Set[int]):
 
     def __len__(self) -> int:
         """
-        Size computation. The most expensive operation.
-        Use int.bit_length(your_integer) to calculate the bit length.
+        Size computation, as a single popcount of the bit vector.
         """
-        res = 0
-        for item in range(1, int.bit_length(self.elems) + 1):
-            if item in self:
-                res += 1
-        return res
+        return bin(self.elems).count("1")
+
+    def __iter__(self) -> Iterator[int]:
+        """ Iterates over the elements in increasing order.
+        Each step extracts the lowest set bit, so only present elements are visited.
+        """
+        bits = self.elems
+        while bits:
+            lowest = bits & -bits
+            yield lowest.bit_length()
+            bits ^= lowest
 
     def add(self, item: int) -> None:
         """ Adds an element to the set.
@@ -65,6 +72,32 @@ class BSet(Set[int]):
         else:
             raise KeyError(item)
 
+    def add_all(self, mask: int) -> None:
+        """ Adds every element whose bit is set in the mask.
+        :raises TypeError: if the mask is not a non-negative integer.
+        """
+        self._check_mask(mask)
+        self.elems |= mask
+
+    def remove_all(self, mask: int) -> None:
+        """ Removes every element whose bit is set in the mask.
+        Elements not in the set are ignored.
+        :raises TypeError: if the mask is not a non-negative integer.
+        """
+        self._check_mask(mask)
+        self.elems &= ~mask
+
+    def set_mask(self, mask: int) -> None:
+        """ Replaces the contents of the set with the elements of the mask.
+        :raises TypeError: if the mask is not a non-negative integer.
+        """
+        self._check_mask(mask)
+        self.elems = mask
+
+    def _check_mask(self, mask: int) -> None:
+        if not isinstance(mask, int) or mask < 0:
+            raise TypeError('Set masks should be non-negative integers')
+
     def union(self, other: BSet[int]) -> BSet[int]:
         """ Creates a new set equal to the union with another one,
         i.e. the result set should contains the elements of self and other.
@@ -93,15 +126,37 @@ class BSet(Set[int]):
 
     def __str__(self):
         """ Construct a nice string representation. """
-        bit_elems = self.elems
-        out_elems = []
-        current = 0
-        while bit_elems:
-            if bit_elems & (1 << current):
-                out_elems.append(str(current+1))
-                bit_elems &= ~(1 << current)
-            current += 1
-        return '{' + ', '.join(out_elems) + '}'
+        return '{' + ', '.join(str(item) for item in self) + '}'
+
+
+class TestBSet(unittest.TestCase):
+    """ Tests for the above class."""
+
+    def setUp(self):
+        self.set = BSet()
+        for item in (1, 4, 9, 64, 200):
+            self.set.add(item)
+
+    def test_len(self):
+        self.assertEqual(len(BSet()), 0)
+        self.assertEqual(len(self.set), 5)
+        self.set.remove(64)
+        self.assertEqual(len(self.set), 4)
+
+    def test_iter(self):
+        self.assertEqual(list(self.set), [1, 4, 9, 64, 200])
+        self.assertEqual(list(BSet()), [])
+        self.assertEqual(str(self.set), '{1, 4, 9, 64, 200}')
+
+    def test_bulk(self):
+        self.set.add_all(0b1011)
+        self.assertEqual(list(self.set), [1, 2, 4, 9, 64, 200])
+        self.set.remove_all(0b110)
+        self.assertEqual(list(self.set), [1, 4, 9, 64, 200])
+        self.set.set_mask(0b10010)
+        self.assertEqual(list(self.set), [2, 5])
+        self.assertRaises(TypeError, self.set.add_all, -1)
+        self.assertRaises(TypeError, self.set.set_mask, "1")
 
 if __name__ == '__main__':
     s = BSet(3)
@@ -8,11 +8,12 @@ __docformat__ = 'reStructuredText'
 
 import unittest
 from abc import ABC, abstractmethod
-from typing import Generic
+from typing import Generic, Iterator
 from data_structures.referential_array import ArrayR, T
 
 class Queue(ABC, Generic[T]):
     """ Abstract class for a generic Queue. """
+    __slots__ = ("length",)
 
     def __init__(self) -> None:
         self.length = 0
@@ -89,10 +90,49 @@ class CircularQueue(Queue[T]):
         self.front = (self.front+1) % len(self.array)
         return item
 
+    def serve_rear(self) -> T:
+        """ Deletes and returns the element at the queue's rear.
+        :pre: queue is not empty
+        :raises Exception: if the queue is empty
+        """
+        if self.is_empty():
+            raise Exception("Queue is empty")
+
+        self.length -= 1
+        self.rear = (self.rear - 1) % len(self.array)
+        return self.array[self.rear]
+
+    def peek_rear(self) -> T:
+        """ Returns the element at the queue's rear, without serving it.
+        :pre: queue is not empty
+        :raises Exception: if the queue is empty
+        """
+        if self.is_empty():
+            raise Exception("Queue is empty")
+        return self.array[(self.rear - 1) % len(self.array)]
+
+    def __getitem__(self, index: int) -> T:
+        """ Returns the element index places from the front, without serving it.
+        :raises IndexError: if the index is out of range
+        """
+        if not 0 <= index < self.length:
+            raise IndexError("Queue index out of range")
+        return self.array[(self.front + index) % len(self.array)]
+
     def is_full(self) -> bool:
         """ True if the queue is full and no element can be appended. """
         return len(self) == len(self.array)
 
+    def __iter__(self) -> Iterator[T]:
+        """ Iterates over the elements from front to rear, without serving them. """
+        for i in range(self.length):
+            yield self.array[(self.front + i) % len(self.array)]
+
+    def __reversed__(self) -> Iterator[T]:
+        """ Iterates over the elements from rear to front, without serving them. """
+        for i in range(self.length - 1, -1, -1):
+            yield self.array[(self.front + i) % len(self.array)]
+
     def clear(self) -> None:
         """ Clears all elements from the queue. """
         Queue.__init__(self)
@@ -100,16 +140,117 @@ class CircularQueue(Queue[T]):
         self.rear = 0
 
 
+class ByteQueue(Queue[int]):
+    """ Circular implementation of a queue of small integers (0 to 255),
+    stored in a bytearray rather than an array of references.
+
+    Attributes:
+         length (int): number of elements in the queue (inherited)
+         front (int): index of the element at the front of the queue
+         array (bytearray): buffer storing the elements of the queue
+         max_capacity (int): most elements the queue can hold
+
+    The buffer starts empty and doubles in size (up to max_capacity)
+    whenever it fills up, so an empty queue costs almost nothing.
+    """
+    __slots__ = ("front", "array", "max_capacity")
+    MIN_CAPACITY = 4
+
+    def __init__(self, max_capacity: int) -> None:
+        Queue.__init__(self)
+        self.front = 0
+        self.array = bytearray()
+        self.max_capacity = max(1, max_capacity)
+
+    def append(self, item: int) -> None:
+        """ Adds an element to the rear of the queue.
+        :pre: queue is not full
+        :raises Exception: if the queue is full
+        :raises ValueError: if the item is not in range(256)
+        """
+        if self.is_full():
+            raise Exception("Queue is full")
+        if self.length == len(self.array):
+            self._resize()
+        self.array[(self.front + self.length) % len(self.array)] = item
+        self.length += 1
+
+    def serve(self) -> int:
+        """ Deletes and returns the element at the queue's front.
+        :pre: queue is not empty
+        :raises Exception: if the queue is empty
+        """
+        if self.is_empty():
+            raise Exception("Queue is empty")
+        self.length -= 1
+        item = self.array[self.front]
+        self.front = (self.front + 1) % len(self.array)
+        return item
+
+    def append_front(self, item: int) -> None:
+        """ Adds an element to the front of the queue, ahead of all others.
+        :pre: queue is not full
+        :raises Exception: if the queue is full
+        :raises ValueError: if the item is not in range(256)
+        """
+        if self.is_full():
+            raise Exception("Queue is full")
+        if self.length == len(self.array):
+            self._resize()
+        self.front = (self.front - 1) % len(self.array)
+        self.array[self.front] = item
+        self.length += 1
+
+    def serve_rear(self) -> int:
+        """ Deletes and returns the element at the queue's rear.
+        :pre: queue is not empty
+        :raises Exception: if the queue is empty
+        """
+        if self.is_empty():
+            raise Exception("Queue is empty")
+        self.length -= 1
+        return self.array[(self.front + self.length) % len(self.array)]
+
+    def is_full(self) -> bool:
+        """ True if the queue is full and no element can be appended. """
+        return len(self) >= self.max_capacity
+
+    def __iter__(self) -> Iterator[int]:
+        """ Iterates over the elements from front to rear, without serving them. """
+        for i in range(self.length):
+            yield self.array[(self.front + i) % len(self.array)]
+
+    def __reversed__(self) -> Iterator[int]:
+        """ Iterates over the elements from rear to front, without serving them. """
+        for i in range(self.length - 1, -1, -1):
+            yield self.array[(self.front + i) % len(self.array)]
+
+    def clear(self) -> None:
+        """ Clears all elements from the queue. """
+        Queue.__init__(self)
+        self.front = 0
+
+    def _resize(self) -> None:
+        """ Grow the buffer, unrolling the elements so the front is at 0. """
+        size = min(self.max_capacity, max(self.MIN_CAPACITY, 2 * len(self.array)))
+        new_array = bytearray(size)
+        for i in range(self.length):
+            new_array[i] = self.array[(self.front + i) % len(self.array)]
+        self.array = new_array
+        self.front = 0
+
+
 class TestQueue(unittest.TestCase):
     """ Tests for the above class."""
     EMPTY = 0
     ROOMY = 5
     LARGE = 10
     CAPACITY = 20
+    QUEUE = CircularQueue
 
     def setUp(self):
         self.lengths = [self.EMPTY, self.ROOMY, self.LARGE, self.ROOMY, self.LARGE]
-        self.queues = [CircularQueue(self.CAPACITY) for i in range(len(self.lengths))]
+        self.queues = [self.QUEUE(self.CAPACITY) for i in range(len(self.lengths))]
         for queue, length in zip(self.queues, self.lengths):
             for i in range(length):
                 queue.append(i)
@@ -184,6 +325,64 @@ class TestQueue(unittest.TestCase):
             self.assertEqual(len(queue), 0)
             self.assertTrue(queue.is_empty())
 
+    def test_iter(self):
+        for queue in self.queues:
+            queue.clear()
+            for i in range(self.CAPACITY):
+                queue.append(i)
+            for i in range(self.ROOMY):
+                queue.serve()
+                queue.append(i)
+            expected = list(range(self.ROOMY, self.CAPACITY)) + list(range(self.ROOMY))
+            self.assertEqual(list(queue), expected)
+            self.assertEqual(list(reversed(queue)), expected[::-1])
+            # Iterating must not change the queue.
+            self.assertEqual(len(queue), self.CAPACITY)
+            self.assertEqual(queue.serve(), expected[0])
+
+    def test_serve_rear(self):
+        queue = CircularQueue(self.ROOMY)
+        for i in range(self.ROOMY):
+            queue.append(i)
+        queue.serve()
+        queue.append(self.ROOMY)
+        self.assertEqual(queue.peek_rear(), self.ROOMY)
+        self.assertEqual(queue.serve_rear(), self.ROOMY)
+        self.assertEqual(queue.serve_rear(), self.ROOMY - 1)
+        queue.append(10)
+        self.assertEqual(list(queue), [1, 2, 3, 10])
+        self.assertEqual(queue[3], 10)
+        self.assertRaises(IndexError, queue.__getitem__, 4)
+        self.assertEqual(queue.serve(), 1)
+
+class TestByteQueue(TestQueue):
+    """ Runs the queue tests against ByteQueue, plus its own."""
+    QUEUE = ByteQueue
+
+    def test_wrap_and_grow(self):
+        queue = ByteQueue(self.CAPACITY)
+        for i in range(3):
+            queue.append(i)
+        queue.serve()
+        for i in range(3, self.CAPACITY + 1):
+            queue.append(i)
+        self.assertTrue(queue.is_full())
+        self.assertEqual(len(queue.array), self.CAPACITY)
+        self.assertRaises(Exception, queue.append, 0)
+        for i in range(1, self.CAPACITY + 1):
+            self.assertEqual(queue.serve(), i)
+
+    def test_both_ends(self):
+        queue = ByteQueue(self.CAPACITY)
+        for i in range(self.ROOMY):
+            queue.append(i)
+            queue.append_front(100 + i)
+        self.assertEqual(list(queue), [104, 103, 102, 101, 100, 0, 1, 2, 3, 4])
+        self.assertEqual(queue.serve_rear(), 4)
+        self.assertEqual(queue.serve(), 104)
+        self.assertEqual(queue.serve_rear(), 3)
+        self.assertEqual(list(queue), [103, 102, 101, 100, 0, 1, 2])
+
 if __name__ == '__main__':
     testtorun = TestQueue()
     suite = unittest.TestLoader().loadTestsFromModule(testtorun)
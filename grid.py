@@ -14,6 +14,9 @@ class Grid:
         DRAW_STYLE_SEQUENCE
     )
 
+    # What snapshot returns for a grid nothing has been done to.
+    EMPTY_SNAPSHOT = (0, ())
+
     DEFAULT_BRUSH_SIZE = 2
     MAX_BRUSH = 5
     MIN_BRUSH = 0
@@ -35,20 +38,100 @@ class Grid:
         self.y = y
         # self.paint = ArrayStack(10000)
         # self.redo = ArrayStack(10000)
-        self.grid = ArrayR(x)
-        for i in range(x):
-            sub = ArrayR(y)
-            for j in range(y):
-                if draw_style == self.DRAW_STYLE_SET:
-                    sub[j] = SetLayerStore()
-                if draw_style == self.DRAW_STYLE_ADD:
-                    sub[j] = AdditiveLayerStore()
-                if draw_style == self.DRAW_STYLE_SEQUENCE:
-                    sub[j] = SequenceLayerStore()
-            self.grid[i] = sub
+        # Number of times special has been activated. Squares read it to
+        # take into account the specials since they last changed.
+        self.special_epoch = 0
+        # Squares are only created when first indexed.
+        # Until then they show the blank square, which holds no layers.
+        self.blank = self.new_square()
+        self.grid = ChunkedCells(self.new_square, x, y)
+        self.frame = None
+        self.frame_bg = None
+        self.dirty = set()
+        self.all_dirty = True
+        self.animated = {}
+        self.groups = {}
+        self.updated = ()
               
     def __getitem__(self, key):
-        return self.grid[key]    
+        if key < 0:
+            key += self.x
+        if not 0 <= key < self.x:
+            raise IndexError(f"Column {key} is outside the grid")
+        return GridColumn(self, key)
+
+    def new_square(self, x=None, y=None) -> LayerStore:
+        """
+        Create the LayerStore for square (x, y), being used for the first time.
+        Changes to it mark it dirty; the blank square is created without a position.
+        It starts with none of the grid's specials in its own state,
+        and so shows every special activated so far, like the blank square.
+        """
+        if self.draw_style == self.DRAW_STYLE_SET:
+            square = SetLayerStore()
+        elif self.draw_style == self.DRAW_STYLE_ADD:
+            square = AdditiveLayerStore()
+        elif self.draw_style == self.DRAW_STYLE_SEQUENCE:
+            square = SequenceLayerStore()
+        else:
+            raise ValueError(f"Unknown draw style {self.draw_style}")
+        square.owner = self
+        if x is not None:
+            square.position = (x, y)
+        return square
+
+    def squares(self):
+        """
+        Iterates over ((x, y), square) for every square created so far.
+        """
+        return self.grid.items()
+
+    def snapshot(self) -> tuple[int, tuple]:
+        """
+        Returns a compact copy of everything the grid holds, for restore.
+        Squares holding the same as an unused square are left out.
+        """
+        blank = self.blank.get_state()
+        states = []
+        for position, square in self.squares():
+            state = square.get_state()
+            if state != blank:
+                states.append((position, state))
+        return (self.special_epoch, tuple(states))
+
+    def restore(self, snapshot: tuple[int, tuple]) -> None:
+        """
+        Return the grid to exactly how it was when snapshot was taken.
+        """
+        special_epoch, states = snapshot
+        self.special_epoch = special_epoch
+        self.blank = self.new_square()
+        self.grid = ChunkedCells(self.new_square, self.x, self.y)
+        for (x, y), state in states:
+            square = self.grid.materialize(x, y)
+            square.epoch = special_epoch
+            square.set_state(state)
+        self.all_dirty = True
+
+    def apply_steps(self, xs, ys, layers, erase=False) -> None:
+        """
+        Add (or erase) each layer on the square at the matching position, in order.
+        The same as grid[x][y].add(layer) for each step, without building
+        a GridColumn and looking up the same methods for every step.
+        """
+        materialize = self.grid.materialize
+        for x, y, layer in zip(xs, ys, layers):
+            square = materialize(x, y)
+            if erase:
+                square.erase(layer)
+            else:
+                square.add(layer)
+
+    def mark_dirty(self, x, y) -> None:
+        """
+        Record that square (x, y) may have changed since the last render.
+        """
+        self.dirty.add((x, y))
 
     def increase_brush_size(self):
         """
@@ -74,12 +157,182 @@ class Grid:
     def special(self):
         """
         Activate the special affect on all grid squares.
+
+        Only the grid's epoch is advanced here. Each square compares it with
+        its own when read, and applies the specials it missed to its state
+        when next changed (see LayerStore.catch_up), so this takes constant
+        time however large the grid is.
         """
-        for i in range(self.x):
-            for j in range(self.y):
-                self.grid[i][j].special()
+        self.special_epoch += 1
+        self.all_dirty = True
+
+    def render(self, timestamp, bg) -> bytearray:
+        """
+        Render the whole grid as a single frame.
+        - timestamp: The timestamp passed to every layer.
+        - bg: The colour every square starts from.
+
+        Returns a bytearray of shape (x, y, 3), so the colour of square (i, j)
+        is stored at offset (i * y + j) * 3. The same bytearray is reused and
+        updated in place by later calls.
+
+        Only squares changed since the last render, and squares holding a
+        time dependent layer, are recomputed. Their positions are left in
+        `updated` for the caller, which is None when the whole frame was redrawn.
+        Static squares answer from their own colour cache. The remaining
+        squares are grouped by the layers they apply, and each layer (or
+        fused lookup table) is applied once per group over all the squares in it.
+        Groups are kept between frames, and a group is only rebuilt when
+        one of its squares has changed.
+        """
+        bg = tuple(bg)
+        dirty, self.dirty = self.dirty, set()
+        blank = bytes(self.blank.get_color(bg, timestamp, 0, 0))
+        if self.frame is None or self.frame_bg != bg or self.all_dirty:
+            self.all_dirty = False
+            self.frame = bytearray(blank * (self.x * self.y))
+            self.frame_bg = bg
+            self.animated = {}
+            self.groups = {}
+            self.updated = None
+            squares = self.squares()
+        else:
+            get = self.grid.get
+            squares = [((i, j), get(i, j)) for i, j in dirty]
+            self.updated = dirty.union(self.animated)
+
+        frame = self.frame
+        # Position of each animated square -> the key of its group.
+        animated = self.animated
+        # id of a pipeline -> (pipeline, xs, ys, frame offsets) of the squares applying it.
+        # The group holds on to its pipeline, so the id is not reused while it exists.
+        groups = self.groups
+        stale = set()
+        joined = []
+        for (i, j), square in squares:
+            key = animated.pop((i, j), None)
+            if key is not None:
+                stale.add(key)
+            offset = (i * self.y + j) * 3
+            if square is None:
+                frame[offset:offset+3] = blank
+            elif not square.is_time_dependent():
+                frame[offset:offset+3] = bytes(square.get_color(bg, timestamp, i, j))
+            else:
+                # Squares applying the same layers share one pipeline object.
+                pipeline = square.get_pipeline()
+                animated[(i, j)] = id(pipeline)
+                joined.append((pipeline, i, j, offset))
+
+        # Drop changed squares from the groups they were in...
+        for key in stale:
+            _, xs, ys, offsets = groups[key]
+            kept = [
+                (i, j, offset) for i, j, offset in zip(xs, ys, offsets)
+                if (i, j) not in dirty
+            ]
+            if kept:
+                xs[:], ys[:], offsets[:] = (list(column) for column in zip(*kept))
+            else:
+                del groups[key]
+        # ...then add them to the groups they are in now.
+        for pipeline, i, j, offset in joined:
+            group = groups.get(id(pipeline))
+            if group is None:
+                group = (pipeline, [], [], [])
+                groups[id(pipeline)] = group
+            group[1].append(i)
+            group[2].append(j)
+            group[3].append(offset)
+
+        for pipeline, xs, ys, offsets in groups.values():
+            colors = [bg] * len(xs)
+            for step in pipeline:
+                colors = step.apply_batch(colors, timestamp, xs, ys)
+            for color, offset in zip(colors, offsets):
+                frame[offset:offset+3] = bytes(color)
+        return frame
+
+
+class GridColumn:
+    """
+    A single column of a Grid, as returned by grid[x].
+    Indexing it gives the LayerStore of that square, which marks itself
+    dirty whenever it is changed.
+    """
+
+    def __init__(self, grid: Grid, x) -> None:
+        self.grid = grid
+        self.x = x
+
+    def __len__(self) -> int:
+        return self.grid.y
+
+    def __getitem__(self, key) -> LayerStore:
+        if key < 0:
+            key += self.grid.y
+        return self.grid.grid.materialize(self.x, key)
+
+
+class ChunkedCells:
+    """
+    Storage for the squares of a Grid, split into square tiles.
+    Tiles are held in a dict keyed by tile position, and a tile is only
+    allocated when one of its squares is first asked for. A square's
+    LayerStore is likewise only created the first time it is asked for,
+    so memory is proportional to the area that has been used.
+    """
+
+    TILE_SIZE = 32
+
+    def __init__(self, new_square, x, y) -> None:
+        self.new_square = new_square
+        self.x = x
+        self.y = y
+        self.tiles = {}
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.x
+
+    def get(self, x, y) -> LayerStore | None:
+        """Returns the square at (x, y), or None if it has never been used."""
+        tile = self.tiles.get((x // self.TILE_SIZE, y // self.TILE_SIZE))
+        if tile is None:
+            return None
+        return tile[(x % self.TILE_SIZE) * self.TILE_SIZE + y % self.TILE_SIZE]
+
+    def materialize(self, x, y) -> LayerStore:
+        """Returns the square at (x, y), creating it (and its tile) if needed."""
+        if not (0 <= x < self.x and 0 <= y < self.y):
+            raise IndexError(f"Square {(x, y)} is outside the grid")
+        key = (x // self.TILE_SIZE, y // self.TILE_SIZE)
+        tile = self.tiles.get(key)
+        if tile is None:
+            tile = ArrayR(self.TILE_SIZE * self.TILE_SIZE)
+            self.tiles[key] = tile
+        index = (x % self.TILE_SIZE) * self.TILE_SIZE + y % self.TILE_SIZE
+        square = tile[index]
+        if square is None:
+            square = self.new_square(x, y)
+            tile[index] = square
+            self.count += 1
+        return square
+
+    def items(self):
+        """Iterates over ((x, y), square) for every square created so far."""
+        for (tx, ty), tile in self.tiles.items():
+            for index in range(len(tile)):
+                square = tile[index]
+                if square is not None:
+                    yield (
+                        (tx * self.TILE_SIZE + index // self.TILE_SIZE,
+                         ty * self.TILE_SIZE + index % self.TILE_SIZE),
+                        square,
+                    )
+
     
 if __name__ == "__main__":
-    g = Grid("set",5,6)
-    print(g.grid[2][1])
-    print(g.grid[2][3])
+    g = Grid(Grid.DRAW_STYLE_SET, 5, 6)
+    print(g[2][1])
+    print(g[2][3])
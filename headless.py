@@ -0,0 +1,86 @@
+"""
+Headless rendering of a Grid, without opening a window.
+
+Frames are produced with Grid.render and written as PPM or PNG images,
+or returned as raw RGB bytes. Nothing here imports arcade, so this can
+run on machines without a display.
+"""
+
+from __future__ import annotations
+import struct
+import zlib
+from grid import Grid
+
+DEFAULT_BG = (255, 255, 255)
+
+def render_frame(grid: Grid, timestamp=0, bg=DEFAULT_BG) -> bytes:
+    """
+    Render the grid and return a copy of the raw frame.
+    The frame has shape (x, y, 3), as described in Grid.render.
+    """
+    return bytes(grid.render(timestamp, bg))
+
+def image_bytes(grid: Grid, timestamp=0, bg=DEFAULT_BG, scale=1) -> bytes:
+    """
+    Render the grid as an RGB image, one row at a time from the top.
+    The image is oriented like the window, so y = 0 is the bottom row.
+    Each square becomes a scale by scale block of pixels.
+    """
+    frame = grid.render(timestamp, bg)
+    rows = []
+    for y in range(grid.y - 1, -1, -1):
+        row = b"".join(
+            bytes(frame[(x * grid.y + y) * 3:(x * grid.y + y) * 3 + 3]) * scale
+            for x in range(grid.x)
+        )
+        rows.extend([row] * scale)
+    return b"".join(rows)
+
+def encode_ppm(width, height, pixels: bytes) -> bytes:
+    """Encode RGB pixels, top row first, as a binary PPM image."""
+    return b"P6\n%d %d\n255\n" % (width, height) + pixels
+
+def encode_png(width, height, pixels: bytes) -> bytes:
+    """Encode RGB pixels, top row first, as a PNG image."""
+    def chunk(kind, data):
+        return (
+            struct.pack(">I", len(data))
+            + kind
+            + data
+            + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+        )
+
+    stride = width * 3
+    # Every scanline starts with filter type 0 (no filtering).
+    raw = b"".join(
+        b"\x00" + pixels[row * stride:(row + 1) * stride]
+        for row in range(height)
+    )
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(raw))
+        + chunk(b"IEND", b"")
+    )
+
+def write_ppm(path, grid: Grid, timestamp=0, bg=DEFAULT_BG, scale=1) -> None:
+    """Render the grid and save it as a PPM image."""
+    pixels = image_bytes(grid, timestamp, bg, scale)
+    with open(path, "wb") as f:
+        f.write(encode_ppm(grid.x * scale, grid.y * scale, pixels))
+
+def write_png(path, grid: Grid, timestamp=0, bg=DEFAULT_BG, scale=1) -> None:
+    """Render the grid and save it as a PNG image."""
+    pixels = image_bytes(grid, timestamp, bg, scale)
+    with open(path, "wb") as f:
+        f.write(encode_png(grid.x * scale, grid.y * scale, pixels))
+
+if __name__ == "__main__":
+    from layers import rainbow, black
+
+    g = Grid(Grid.DRAW_STYLE_SET, 32, 32)
+    for i in range(32):
+        g[i][i].add(rainbow)
+        g[i][31-i].add(black)
+    write_png("grid.png", g, 7, scale=8)
+    print("Wrote grid.png")
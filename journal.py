@@ -0,0 +1,234 @@
+"""
+Append-only binary journal of paint, undo, redo and special events.
+
+A journal file starts with a short header, followed by one record per event:
+
+    kind     1 byte    PAINT, SPECIAL, UNDO, REDO or SESSION
+    flags    1 byte    FLAG_SPECIAL if the action undone / redone was a special,
+                       or for SESSION, the position of the draw style in
+                       Grid.DRAW_STYLE_OPTIONS
+    count    4 bytes   number of steps in the action
+    layers   count bytes, the layer index of each step
+    coords   count * 8 bytes, x then y of each step, as 4 byte integers
+    crc      4 bytes   CRC32 of everything above in this record
+
+All integers are little endian. Records are only ever appended, through a
+buffered writer, so a crash can at worst leave a partly written record at
+the end; the reader notices and ignores it.
+
+A SESSION record (with no steps) starts each drawing session, so a file
+appended to across several sessions, possibly in different draw styles,
+can still be replayed one session at a time.
+"""
+
+from __future__ import annotations
+import mmap
+import os
+import struct
+import zlib
+from array import array
+from action import CompactPaintAction, PaintAction
+from grid import Grid
+from replay import ReplayTracker
+
+MAGIC = b"PJNL"
+VERSION = 2
+HEADER = struct.Struct("<4sB3x")
+
+PAINT = 0
+SPECIAL = 1
+UNDO = 2
+REDO = 3
+SESSION = 4
+
+FLAG_SPECIAL = 1
+
+RECORD = struct.Struct("<BBI")
+CRC = struct.Struct("<I")
+COORD = struct.Struct("<I")
+
+def encode_record(kind: int, action: PaintAction|CompactPaintAction|None=None, flags: int=0) -> bytes:
+    """Encode one event as a journal record."""
+    if action is None:
+        action = CompactPaintAction(is_special=kind == SPECIAL)
+    elif not isinstance(action, CompactPaintAction):
+        action = CompactPaintAction.from_action(action)
+    if action.is_special and kind != SPECIAL:
+        flags |= FLAG_SPECIAL
+    coords = struct.pack(f"<{len(action.coords)}I", *action.coords)
+    body = RECORD.pack(kind, flags, len(action)) + bytes(action.layers) + coords
+    return body + CRC.pack(zlib.crc32(body))
+
+def record_size(count: int) -> int:
+    """The size of a record holding count steps."""
+    return RECORD.size + count * (1 + 2 * COORD.size) + CRC.size
+
+
+class JournalWriter:
+    """
+    Appends events to a journal file, creating it if needed.
+    Writes are buffered, so call flush or close to be sure they reach the file.
+    """
+
+    BUFFER_SIZE = 1 << 16
+
+    def __init__(self, path, buffer_size: int=BUFFER_SIZE) -> None:
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            # Cut off anything left partly written, so new records follow the last good one.
+            with Journal(path) as journal:
+                end = journal.end
+            os.truncate(path, end)
+        self.file = open(path, "ab", buffering=buffer_size)
+        if self.file.tell() == 0:
+            self.file.write(HEADER.pack(MAGIC, VERSION))
+
+    def write(self, kind: int, action: PaintAction|CompactPaintAction|None=None, flags: int=0) -> None:
+        self.file.write(encode_record(kind, action, flags))
+
+    def session(self, draw_style: str) -> None:
+        """Mark the start of a new drawing session in the given draw style."""
+        self.write(SESSION, flags=Grid.DRAW_STYLE_OPTIONS.index(draw_style))
+
+    def paint(self, action: PaintAction|CompactPaintAction) -> None:
+        self.write(PAINT, action)
+
+    def special(self) -> None:
+        self.write(SPECIAL)
+
+    def undo(self, action: PaintAction|CompactPaintAction) -> None:
+        self.write(UNDO, action)
+
+    def redo(self, action: PaintAction|CompactPaintAction) -> None:
+        self.write(REDO, action)
+
+    def flush(self) -> None:
+        self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __enter__(self) -> JournalWriter:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def check_header(data: bytes) -> None:
+    """
+    :raises ValueError: if data does not start a journal this version can read
+    """
+    if len(data) < HEADER.size:
+        raise ValueError("Not a journal: file too short")
+    magic, version = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not a journal: bad magic")
+    if version != VERSION:
+        raise ValueError(f"Unsupported journal version {version}")
+
+
+class Journal:
+    """
+    Read access to a journal file, without loading it.
+
+    The file is memory mapped, and opening it only walks the record headers
+    to build an index of where each record starts. Records are decoded
+    when asked for. A truncated or corrupt record at the end is ignored.
+    """
+
+    def __init__(self, path) -> None:
+        self.file = open(path, "rb")
+        try:
+            check_header(self.file.read(HEADER.size))
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise
+        self.offsets = array("Q")
+        offset = HEADER.size
+        end = len(self.data)
+        while offset + RECORD.size <= end:
+            _, _, count = RECORD.unpack_from(self.data, offset)
+            size = record_size(count)
+            if offset + size > end:
+                break
+            self.offsets.append(offset)
+            offset += size
+        # Only the last record can have been partly written.
+        if self.offsets and not self._crc_ok(self.offsets[-1]):
+            offset = self.offsets.pop()
+        # Where the last good record ends.
+        self.end = offset
+
+    def _crc_ok(self, offset: int) -> bool:
+        _, _, count = RECORD.unpack_from(self.data, offset)
+        end = offset + record_size(count) - CRC.size
+        return zlib.crc32(self.data[offset:end]) == CRC.unpack_from(self.data, end)[0]
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __getitem__(self, index: int) -> tuple[int, CompactPaintAction]:
+        """
+        Returns the (kind, action) of a record. Special events give a special action.
+        :raises IndexError: if there is no such record
+        :raises ValueError: if the record is corrupt
+        """
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Journal index out of range")
+        offset = self.offsets[index]
+        if not self._crc_ok(offset):
+            raise ValueError(f"Journal record {index} is corrupt")
+        kind, flags, count = RECORD.unpack_from(self.data, offset)
+        action = CompactPaintAction(is_special=kind == SPECIAL or bool(flags & FLAG_SPECIAL))
+        start = offset + RECORD.size
+        action.layers = bytearray(self.data[start:start + count])
+        action.coords.extend(struct.unpack_from(f"<{2 * count}I", self.data, start + count))
+        return kind, action
+
+    def sessions(self) -> list[tuple[str|None, int, int]]:
+        """
+        Returns (draw_style, start, end) for each drawing session, where records
+        start up to (not including) end are its events. Events before the
+        first SESSION record form a session with an unknown (None) draw style.
+        """
+        sessions = []
+        draw_style = None
+        start = 0
+        for i, offset in enumerate(self.offsets):
+            kind, flags, _ = RECORD.unpack_from(self.data, offset)
+            if kind == SESSION:
+                if i > start or draw_style is not None:
+                    sessions.append((draw_style, start, i))
+                draw_style = Grid.DRAW_STYLE_OPTIONS[flags]
+                start = i + 1
+        if len(self) > start or draw_style is not None:
+            sessions.append((draw_style, start, len(self)))
+        return sessions
+
+    def to_replay(self, session: int=-1) -> ReplayTracker:
+        """
+        Returns a ReplayTracker holding every event of one session (by default
+        the last), in order. Replay it on a new grid of that session's draw style.
+        """
+        replay = ReplayTracker()
+        sessions = self.sessions()
+        if not sessions:
+            return replay
+        _, start, end = sessions[session]
+        for i in range(start, end):
+            kind, action = self[i]
+            replay.add_action(action, is_undo=kind == UNDO)
+        return replay
+
+    def close(self) -> None:
+        self.data.close()
+        self.file.close()
+
+    def __enter__(self) -> Journal:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
@@ -1,11 +1,8 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
 from layer_util import Layer
-from data_structures.queue_adt import CircularQueue
-from data_structures.stack_adt import ArrayStack
+from data_structures.queue_adt import ByteQueue
 from data_structures.bset import BSet
-from data_structures.array_sorted_list import ArraySortedList
-from data_structures.sorted_list_adt import *
 from layers import invert, rainbow, black, lighten, green, red, blue, sparkle, darken
 from layer_util import *
 import colorsys
@@ -16,6 +13,17 @@ class LayerStore(ABC):
 
     def __init__(self) -> None:
         self.color = None
+        self.cache_key = None
+        self.time_dependent = None
+        self.pipeline = None
+        # The grid this square belongs to, if any. Its special_epoch counts the
+        # specials activated on it; epoch is how many of them this store's own
+        # state includes, and cache_epoch the one the remembered values are for.
+        self.owner = None
+        # Where the square is on the owning grid, so changes can be reported to it.
+        self.position = None
+        self.epoch = 0
+        self.cache_epoch = 0
 
     @abstractmethod
     def add(self, layer: Layer) -> bool:
@@ -25,10 +33,97 @@ class LayerStore(ABC):
         """
         pass
 
-    @abstractmethod
     def get_color(self, start, timestamp, x, y) -> tuple[int, int, int]:
         """
         Returns the colour this square should show, given the current layers.
+
+        The last colour is remembered, keyed on the start colour, position and
+        (only when a time dependent layer is applied) the timestamp,
+        so asking again for an unchanged square does no work.
+        """
+        self.check_cache()
+        key = (tuple(start), timestamp if self.is_time_dependent() else None, x, y)
+        if key != self.cache_key:
+            color = start
+            for step in self.get_pipeline():
+                color = step.apply(color, timestamp, x, y)
+            self.color = color
+            self.cache_key = key
+        return self.color
+
+    def is_time_dependent(self) -> bool:
+        """
+        True if any applied layer that affects the colour changes its output over time.
+        """
+        self.check_cache()
+        if self.time_dependent is None:
+            self.time_dependent = any(
+                step.time_dependent for step in self.get_pipeline()
+            )
+        return self.time_dependent
+
+    def get_pipeline(self) -> tuple[Layer|ColorTable, ...]:
+        """
+        Returns the applied layers compiled with compile_layers, so runs of
+        pure layers are fused into lookup tables. Remembered until the store changes.
+        """
+        self.check_cache()
+        if self.pipeline is None:
+            self.pipeline = compile_layers(self.get_applied_layers())
+        return self.pipeline
+
+    def invalidate(self) -> None:
+        """
+        Forget the remembered colour, and tell the owning grid the square needs
+        redrawing. Called whenever the store is changed.
+        """
+        self.forget()
+        if self.position is not None:
+            self.owner.mark_dirty(*self.position)
+
+    def forget(self) -> None:
+        """
+        Forget the remembered colour.
+        """
+        self.color = None
+        self.cache_key = None
+        self.time_dependent = None
+        self.pipeline = None
+
+    def check_cache(self) -> None:
+        """
+        Forget the remembered colour if the owning grid has activated special since.
+        """
+        if self.owner is not None and self.owner.special_epoch != self.cache_epoch:
+            self.cache_epoch = self.owner.special_epoch
+            self.forget()
+
+    def pending_specials(self) -> int:
+        """
+        The number of specials activated on the owning grid that this store's
+        own state does not include yet. Reading the store takes them into
+        account without changing it; see catch_up for changes.
+        """
+        if self.owner is None:
+            return 0
+        return self.owner.special_epoch - self.epoch
+
+    def catch_up(self) -> None:
+        """
+        Apply any pending specials to the store's own state.
+        Called before every change, so the change applies on top of them.
+        """
+        if self.pending_specials():
+            # get_state already includes pending specials.
+            state = self.get_state()
+            self.epoch = self.owner.special_epoch
+            self.set_state(state)
+
+    @abstractmethod
+    def get_applied_layers(self) -> tuple[Layer, ...]:
+        """
+        Returns the layers this square applies, in the order they are applied.
+        Folding `apply` over this tuple from the start colour gives `get_color`.
         """
         pass
 
@@ -47,6 +142,21 @@ class LayerStore(ABC):
         """
         pass
 
+    @abstractmethod
+    def get_state(self):
+        """
+        Returns a small immutable value describing everything this square holds,
+        including any pending specials.
+        """
+        pass
+
+    @abstractmethod
+    def set_state(self, state) -> None:
+        """
+        Make this square hold exactly what it held when get_state returned state.
+        """
+        pass
+
 class SetLayerStore(LayerStore):
     """
     Set layer store. A single layer can be stored at a time (or nothing at all)
@@ -55,39 +165,47 @@ class SetLayerStore(LayerStore):
     - special: Invert the colour output.
     """
     def __init__(self) -> None:
+        LayerStore.__init__(self)
         self.store = None
         self.spec = False
-    
-    
-    def get_color(self, start, timestamp, x, y) -> tuple[int, int, int]:
-        if self.store == None:
-            if self.spec == True:
-                return invert.apply(start,timestamp,x,y)
-            else:
-                return start
-            
-        if self.spec == False:
-            return self.store.apply(start,timestamp,x,y)
-        elif self.spec == True:
-            return invert.apply(self.store.apply(start,timestamp,x,y),0,0,0)
+
+    def get_applied_layers(self) -> tuple[Layer, ...]:
+        store, spec = self.get_state()
+        layers = () if store == None else (store,)
+        if spec == True:
+            layers += (invert,)
+        return layers
         
     
     def add(self, Layer):
+        self.catch_up()
         if self.store == Layer:
             return False
         self.store = Layer
+        self.invalidate()
         return True
     
     def erase(self, layer):
+        self.catch_up()
         self.store = None
+        self.invalidate()
         return True
-    
+
     def special(self):
-        
+        self.catch_up()
+        self.invalidate()
         if self.spec == False:
             self.spec = True
         else:
             self.spec = False
+
+    def get_state(self) -> tuple[Layer|None, bool]:
+        # Inverting twice changes nothing.
+        return (self.store, self.spec != (self.pending_specials() % 2 == 1))
+
+    def set_state(self, state: tuple[Layer|None, bool]) -> None:
+        self.store, self.spec = state
+        self.invalidate()
         
         
 
@@ -99,44 +217,61 @@ class AdditiveLayerStore(LayerStore):
     - add: Add a new layer to be added last.
     - erase: Remove the first layer that was added. Ignore what is currently selected.
     - special: Reverse the order of current layers (first becomes last, etc.)
+
+    Layers are queued by their index in a ByteQueue, one byte per layer.
+    Reversing only flips the direction the queue is read in, so while
+    reversed, new layers join the front and erasing serves the rear.
     """
+    MAX_LAYERS = 100
+
     def __init__(self) -> None:
-        self.store = CircularQueue(100)
-    
-    def get_color(self, start, timestamp, x, y) -> tuple[int, int, int]:
-        color = start     
-           
-        for i in range(len(self.store)):
-            next_layer = self.store.serve()
-            self.store.append(next_layer)
-            color = next_layer.apply(color,timestamp,x,y)
-        return color
+        LayerStore.__init__(self)
+        self.store = ByteQueue(self.MAX_LAYERS)
+        self.reversed = False
+
+    def get_applied_layers(self) -> tuple[Layer, ...]:
+        all_layers = get_layers()
+        return tuple(all_layers[index] for index in self.get_state())
         
     def add(self, layer):
-        self.store.append(layer)
+        self.catch_up()
+        if self.reversed:
+            self.store.append_front(layer.index)
+        else:
+            self.store.append(layer.index)
+        self.invalidate()
         return True
     
     def erase(self,layer):
+        self.catch_up()
         if self.store.is_empty() == True:
             return False
-        self.store.serve()
+        if self.reversed:
+            self.store.serve_rear()
+        else:
+            self.store.serve()
+        self.invalidate()
         return True
         
     
     def special(self):
-        s1 = ArrayStack(len(self.store))
-        
-        for i in range(len(self.store)):
-            l1 = self.store.serve()
-            s1.push(l1)
-        
-        q1 = CircularQueue(len(s1))
-        
-        for i in range(len(s1)):
-            l2 = s1.pop()
-            q1.append(l2)
-            
-        self.store = q1
+        self.catch_up()
+        self.invalidate()
+        self.reversed = not self.reversed
+
+    def get_state(self) -> bytes:
+        # The layer indices in the order they are applied. Reversing twice changes nothing.
+        if self.reversed != (self.pending_specials() % 2 == 1):
+            return bytes(reversed(self.store))
+        return bytes(self.store)
+
+    def set_state(self, state: bytes) -> None:
+        # Reading forwards or backwards behaves the same, so always restore forwards.
+        self.store.clear()
+        for index in state:
+            self.store.append(index)
+        self.reversed = False
+        self.invalidate()
         
 
 class SequenceLayerStore(LayerStore):
@@ -147,49 +282,90 @@ class SequenceLayerStore(LayerStore):
     - special:
         Of all currently applied layers, remove the one with median `name`.
         In the event of two layers being the median names, pick the lexicographically smaller one.
+
+    The applied layers are fully determined by the BSet's bitmask, so the
+    ordered layers for each mask, and the mask left after special, are
+    worked out once and shared by every store.
     """
+    # Bitmask of applied layers -> those layers in order of index.
+    CHAINS: dict[int, tuple[Layer, ...]] = {}
+    # Bitmask of applied layers -> bitmask after special.
+    SPECIALS: dict[int, int] = {}
+    # BSet element (layer index + 1) -> position of its layer when sorted by name.
+    NAME_RANKS: dict[int, int] = {}
+
     def __init__(self) -> None:
+        LayerStore.__init__(self)
         self.store = BSet()
         self.layers = get_layers()       
-    
-    def get_color(self, start, timestamp, x, y) -> tuple[int, int, int]:
-        color = start
-        for i in range(1,self.NUMBER_OF_LAYERS):
-            if i in self.store:
-                color = self.layers[i-1].apply(color, timestamp, x, y)     
-                    
-        return color
+
+    def get_applied_layers(self) -> tuple[Layer, ...]:
+        mask = self.get_state()
+        layers = self.CHAINS.get(mask)
+        if layers is None:
+            applied = BSet()
+            applied.set_mask(mask)
+            layers = tuple(self.layers[i-1] for i in applied)
+            self.CHAINS[mask] = layers
+        return layers
     
     def add(self, layer):
+        self.catch_up()
         layer_index = layer.index+1
         self.store.add(layer_index)
+        self.invalidate()
         return True
         
         
     def erase(self,layer):
+        self.catch_up()
         layer_index = layer.index+1
         if (layer_index) not in self.store:
             return False
         self.store.remove(layer_index)
+        self.invalidate()
         return True
     
     def special(self):
-        
+        self.catch_up()
         if self.store.is_empty():
             return False
-        
-        lst = ArraySortedList(9)
-        for i in range(1,self.NUMBER_OF_LAYERS):
-            if i in self.store:
-                a = ListItem(self.layers[i-1],self.layers[i-1].name)
-                lst.add(a)
-        
-        middle = len(lst)//2
-        if len(lst) % 2 == 0:
-            middle = (len(lst)//2) -1
-        deleted_item = lst.delete_at_index(middle).value
+        self.store.set_mask(self.special_mask(self.store.elems))
+        self.invalidate()
+
+    @classmethod
+    def special_mask(cls, mask: int) -> int:
+        """
+        Returns the bitmask left after special removes the median named layer from mask.
+        """
+        result = cls.SPECIALS.get(mask)
+        if result is None:
+            if not cls.NAME_RANKS:
+                layers = [layer for layer in get_layers() if layer is not None]
+                for rank, layer in enumerate(sorted(layers, key=lambda layer: layer.name)):
+                    cls.NAME_RANKS[layer.index+1] = rank
+            applied = BSet()
+            applied.set_mask(mask)
+            by_name = sorted(applied, key=lambda i: cls.NAME_RANKS[i])
+            # With an even count, the lexicographically smaller median is picked.
+            middle = (len(by_name) - 1) // 2
+            applied.remove(by_name[middle])
+            result = applied.elems
+            cls.SPECIALS[mask] = result
+        return result
+
+    def get_state(self) -> int:
+        mask = self.store.elems
+        # Each special removes one layer, so stop once there are none left.
+        for _ in range(self.pending_specials()):
+            if not mask:
+                break
+            mask = self.special_mask(mask)
+        return mask
 
-        self.erase(deleted_item)     
+    def set_state(self, state: int) -> None:
+        self.store.set_mask(state)
+        self.invalidate()
                 
 
 if __name__ == "__main__":
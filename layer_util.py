@@ -5,6 +5,7 @@ No need to edit unless adding new features.
 """
 
 from __future__ import annotations
+from collections import OrderedDict
 from dataclasses import dataclass, field
 from data_structures.referential_array import ArrayR
 
@@ -18,12 +19,131 @@ class Layer:
     apply: function
     name: str = field(init=False)
     bg: tuple[int, int, int] | None = None
+    batch: function | None = None
+    time_dependent: bool = False
+    pure: bool = False
+    constant: bool = False
+    self_inverse: bool = False
 
     def __post_init__(self):
         if hasattr(self.apply, "__bg__"):
             self.bg = self.apply.__bg__
+        if hasattr(self.apply, "__batch__"):
+            self.batch = self.apply.__batch__
+        for attr, field_name in FLAGS.items():
+            if hasattr(self.apply, attr):
+                setattr(self, field_name, getattr(self.apply, attr))
         self.name = self.apply.__name__
 
+    def apply_batch(self, colors, timestamp, xs, ys) -> list[tuple[int, int, int]]:
+        """
+        Apply this layer to many squares at once.
+        colors, xs and ys are equal length sequences, one entry per square.
+
+        Uses the batched implementation if the layer has one,
+        otherwise falls back to calling apply once per square.
+        """
+        if self.batch is not None:
+            return self.batch(colors, timestamp, xs, ys)
+        return [
+            self.apply(color, timestamp, x, y)
+            for color, x, y in zip(colors, xs, ys)
+        ]
+
+class ColorTable:
+    """
+    Three 256 entry lookup tables, one per channel, standing in for a run
+    of pure layers. It can be applied just like a layer.
+    """
+    time_dependent = False
+
+    def __init__(self, red: bytes, green: bytes, blue: bytes) -> None:
+        self.red = red
+        self.green = green
+        self.blue = blue
+
+    @classmethod
+    def for_layer(cls, layer: Layer) -> ColorTable:
+        """The table for a single pure layer. Worked out once per layer."""
+        table = LAYER_TABLES.get(layer.index)
+        if table is None:
+            greys = [layer.apply((v, v, v), 0, 0, 0) for v in range(256)]
+            table = cls(*(bytes(grey[c] for grey in greys) for c in range(3)))
+            LAYER_TABLES[layer.index] = table
+        return table
+
+    @classmethod
+    def from_layers(cls, layers) -> ColorTable:
+        """Build the table giving the same result as applying the pure layers in order."""
+        red = green = blue = IDENTITY
+        for layer in layers:
+            table = cls.for_layer(layer)
+            # Composing lookups: red[v] becomes table.red[red[v]].
+            red = red.translate(table.red)
+            green = green.translate(table.green)
+            blue = blue.translate(table.blue)
+        return cls(red, green, blue)
+
+    def apply(self, color, timestamp, x, y) -> tuple[int, int, int]:
+        r, g, b = color
+        return (self.red[r], self.green[g], self.blue[b])
+
+    def apply_batch(self, colors, timestamp, xs, ys) -> list[tuple[int, int, int]]:
+        red, green, blue = self.red, self.green, self.blue
+        return [(red[r], green[g], blue[b]) for r, g, b in colors]
+
+IDENTITY = bytes(range(256))
+
+# Layer index -> the ColorTable of that (pure) layer on its own.
+LAYER_TABLES: dict[int, ColorTable] = {}
+
+# Layer indices -> the compiled pipeline for those layers,
+# least recently used first. Holds at most MAX_PIPELINES entries.
+PIPELINES: OrderedDict[tuple[int, ...], tuple[Layer|ColorTable, ...]] = OrderedDict()
+MAX_PIPELINES = 4096
+
+def compile_layers(layers) -> tuple[Layer|ColorTable, ...]:
+    """
+    Compile an ordered sequence of layers into a pipeline giving the same colours.
+    - Everything before the last constant layer is dropped, as its output is ignored.
+    - Adjacent pairs of the same self-inverse layer cancel out.
+    - Every run of consecutive pure layers is fused into one ColorTable.
+    Pipelines are shared between everything applying the same layers.
+    """
+    key = tuple(layer.index for layer in layers)
+    pipeline = PIPELINES.get(key)
+    if pipeline is not None:
+        PIPELINES.move_to_end(key)
+    else:
+        start = 0
+        for i, layer in enumerate(layers):
+            if layer.constant:
+                start = i
+        kept = []
+        for layer in layers[start:]:
+            if layer.self_inverse and kept and kept[-1].index == layer.index:
+                kept.pop()
+            else:
+                kept.append(layer)
+
+        steps = []
+        run = []
+        for layer in kept:
+            if layer.pure:
+                run.append(layer)
+                continue
+            if run:
+                steps.append(ColorTable.from_layers(run))
+                run = []
+            steps.append(layer)
+        if run:
+            steps.append(ColorTable.from_layers(run))
+        pipeline = tuple(steps)
+        PIPELINES[key] = pipeline
+        if len(PIPELINES) > MAX_PIPELINES:
+            PIPELINES.popitem(last=False)
+    return pipeline
+
 class background(object):
     """Simple decorator to add a __bg__ property to a layer
 
@@ -43,6 +163,96 @@ class background(object):
         func.__bg__ = self.val
         return layer
 
+class batched(object):
+    """Simple decorator to add a batched implementation to a layer
+
+    Usage:  @register
+            @batched(my_special_layer_batch)
+            def my_special_layer(...):
+
+    The batched implementation is called as
+    my_special_layer_batch(colors, timestamp, xs, ys)
+    and should return a list with the new colour of every square.
+    """
+    def __init__(self, batch):
+        self.batch = batch
+
+    def __call__(self, layer: function|Layer):
+        # This could be applied before or after registration
+        if isinstance(layer, Layer):
+            func = layer.apply
+            layer.batch = self.batch
+        else:
+            func = layer
+        func.__batch__ = self.batch
+        return layer
+
+# Function attribute set by each flag decorator -> the Layer field it sets.
+FLAGS = {
+    "__animated__": "time_dependent",
+    "__pure__": "pure",
+    "__constant__": "constant",
+    "__self_inverse__": "self_inverse",
+}
+
+def _flag(layer: function|Layer, attr: str) -> function|Layer:
+    # This could be applied before or after registration
+    if isinstance(layer, Layer):
+        func = layer.apply
+        setattr(layer, FLAGS[attr], True)
+    else:
+        func = layer
+    setattr(func, attr, True)
+    return layer
+
+def animated(layer: function|Layer):
+    """Simple decorator to mark a layer as changing over time
+
+    Usage:  @register
+            @animated
+            def my_special_layer(...):
+
+    Squares without an animated layer only need their colour recomputed
+    when they are changed.
+    """
+    return _flag(layer, "__animated__")
+
+def pure(layer: function|Layer):
+    """Simple decorator to mark a layer as colour-pure
+
+    Usage:  @register
+            @pure
+            def my_special_layer(...):
+
+    A pure layer ignores the timestamp and position, and each output
+    channel depends only on the same input channel.
+    Runs of pure layers are fused into lookup tables.
+    """
+    return _flag(layer, "__pure__")
+
+def constant(layer: function|Layer):
+    """Simple decorator to mark a layer as ignoring its input colour
+
+    Usage:  @register
+            @constant
+            def my_special_layer(...):
+
+    Layers applied before a constant layer have no effect, so are skipped.
+    """
+    return _flag(layer, "__constant__")
+
+def self_inverse(layer: function|Layer):
+    """Simple decorator to mark a layer as undoing itself
+
+    Usage:  @register
+            @self_inverse
+            def my_special_layer(...):
+
+    Applying a self-inverse layer twice in a row gives back the original
+    colour, so such pairs are skipped.
+    """
+    return _flag(layer, "__self_inverse__")
+
 def register(func):
     """
     Layer register function.
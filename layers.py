@@ -3,70 +3,197 @@ All layers are defined here.
 """
 
 import colorsys
-from layer_util import background, register
+from functools import lru_cache
+from layer_util import animated, background, batched, constant, pure, register, self_inverse
+
+# Rainbow's hue goes once around the colour wheel every RAINBOW_PERIOD steps
+# along the diagonal (or time units), so every frame is a diagonal shift of
+# one ramp of colours. The ramp holds RAINBOW_RESOLUTION colours per step.
+RAINBOW_PERIOD = 20
+RAINBOW_RESOLUTION = 64
+RAINBOW_RAMP = tuple(
+    tuple(int(255*c) for c in colorsys.hls_to_rgb(i / (RAINBOW_PERIOD * RAINBOW_RESOLUTION), 0.6, 0.6))
+    for i in range(RAINBOW_PERIOD * RAINBOW_RESOLUTION)
+)
+
+def rainbow_offset(timestamp) -> int:
+    """Position in RAINBOW_RAMP of square (0, 0) at this time."""
+    return round(timestamp * RAINBOW_RESOLUTION)
+
+def rainbow_index(timestamp, x, y) -> int:
+    """Position in RAINBOW_RAMP of square (x, y) at this time."""
+    return (rainbow_offset(timestamp) + (x + y) * RAINBOW_RESOLUTION) % len(RAINBOW_RAMP)
+
+def rainbow_batch(colors, timestamp, xs, ys):
+    # Only the diagonal a square is on (mod RAINBOW_PERIOD) affects its colour,
+    # so look up each diagonal's colour once from the frame's ramp offset.
+    offset = rainbow_offset(timestamp)
+    diagonals = [
+        RAINBOW_RAMP[(offset + d * RAINBOW_RESOLUTION) % len(RAINBOW_RAMP)]
+        for d in range(RAINBOW_PERIOD)
+    ]
+    return [diagonals[(x + y) % RAINBOW_PERIOD] for x, y in zip(xs, ys)]
 
 @register
 @background(200, 0, 120)
+@batched(rainbow_batch)
+@constant
+@animated
 def rainbow(color, timestamp, x, y):
-    return tuple(
-        int(255*x)
-        for x in colorsys.hls_to_rgb((timestamp/20 + x/20 + y/20)%1, 0.6, 0.6)
-    )
+    return RAINBOW_RAMP[rainbow_index(timestamp, x, y)]
+
+def black_batch(colors, timestamp, xs, ys):
+    return [(0, 0, 0)] * len(colors)
 
 @register
 @background(170, 170, 170)
+@batched(black_batch)
+@constant
 def black(color, timestamp, x, y):
     return (0, 0, 0)
 
+def lighten_batch(colors, timestamp, xs, ys):
+    return [
+        (min(255, r + 40), min(255, g + 40), min(255, b + 40))
+        for r, g, b in colors
+    ]
+
 @register
 @background(240, 240, 240)
+@batched(lighten_batch)
+@pure
 def lighten(color, timestamp, x, y):
     return tuple(
         min(255, x + 40)
         for x in color
     )
 
+def invert_batch(colors, timestamp, xs, ys):
+    return [
+        (255 - r, 255 - g, 255 - b)
+        for r, g, b in colors
+    ]
+
 @register
 @background(0, 255, 255)
+@batched(invert_batch)
+@pure
+@self_inverse
 def invert(color, timestamp, x, y):
     return tuple(
         255 - c
         for c in color
     )
 
+def red_batch(colors, timestamp, xs, ys):
+    return [(255, 0, 0)] * len(colors)
+
 @register
 @background(255, 0, 0)
+@batched(red_batch)
+@constant
 def red(color, timestamp, x, y):
     return (255, 0, 0)
 
+def green_batch(colors, timestamp, xs, ys):
+    return [(0, 255, 0)] * len(colors)
+
 @register
 @background(0, 255, 0)
+@batched(green_batch)
+@constant
 def green(color, timestamp, x, y):
     return (0, 255, 0)
 
+def blue_batch(colors, timestamp, xs, ys):
+    return [(0, 0, 255)] * len(colors)
+
 @register
 @background(0, 0, 255)
+@batched(blue_batch)
+@constant
 def blue(color, timestamp, x, y):
     return (0, 0, 255)
 
+LCG_MULTIPLIER = 1103515245
+LCG_INCREMENT = 12345
+LCG_MODULUS = 1 << 31
+
+def lcg_jumps(steps: int) -> list[tuple[int, int]]:
+    """
+    Precompute how to advance the sparkle LCG by k steps, for k up to steps.
+    Entry k is (a, c) such that k steps take v to (a * v + c) % LCG_MODULUS.
+    """
+    jumps = [(1, 0)]
+    for _ in range(steps):
+        a, c = jumps[-1]
+        jumps.append((
+            LCG_MULTIPLIER * a % LCG_MODULUS,
+            (LCG_MULTIPLIER * c + LCG_INCREMENT) % LCG_MODULUS,
+        ))
+    return jumps
+
+# Sparkle advances the LCG by between 10 and 26 steps at a time.
+SPARKLE_JUMPS = lcg_jumps(26)
+
+@lru_cache(maxsize=1 << 16)
+def sparkle_decision(x, y, steps) -> bool:
+    """Whether sparkle lightens square (x, y) when advancing the LCG this many steps."""
+    a, c = SPARKLE_JUMPS[steps]
+    other = (a * x + c) % LCG_MODULUS
+    other = (a * (other + y) + c) % LCG_MODULUS
+    other = (other & ((1 << 31)-1)) >> 16
+    return other/(1 << 15) < 0.1
+
+def sparkle_lightens(timestamp, x, y) -> bool:
+    """Whether sparkle lightens (rather than darkens) this square at this time."""
+    # ts only changes every third of a time unit, and only ts * 31 % 17 matters.
+    ts = int((timestamp + x/3 + y/5) * 3)
+    return sparkle_decision(x, y, 10 + (ts * 31 % 17))
+
+def sparkle_batch(colors, timestamp, xs, ys):
+    # Split the squares into those being lightened and those being darkened,
+    # then apply each of the two layers once over its half.
+    lit = []
+    dim = []
+    for i, (x, y) in enumerate(zip(xs, ys)):
+        if sparkle_lightens(timestamp, x, y):
+            lit.append(i)
+        else:
+            dim.append(i)
+    result = [None] * len(colors)
+    for indices, layer in ((lit, lighten), (dim, darken)):
+        if not indices:
+            continue
+        changed = layer.apply_batch(
+            [colors[i] for i in indices],
+            timestamp,
+            [xs[i] for i in indices],
+            [ys[i] for i in indices],
+        )
+        for i, color in zip(indices, changed):
+            result[i] = color
+    return result
+
 @register
 @background(100, 170, 255)
+@batched(sparkle_batch)
+@animated
 def sparkle(color, timestamp, x, y):
-    ts = int((timestamp + x/3 + y/5) * 3)
-    other = x
-    for _ in range(10 + (ts * 31 % 17)):
-        other = (1103515245 * other + 12345) % (1 << 31)
-    other += y
-    for _ in range(10 + (ts * 31 % 17)):
-        other = (1103515245 * other + 12345) % (1 << 31)
-    ts = int((timestamp + x/10 + y/20) * 3)
-    other = (other & ((1 << 31)-1)) >> 16
-    if other/(1 << 15) < 0.1:
+    if sparkle_lightens(timestamp, x, y):
         return lighten.apply(color, timestamp, x, y)
     return darken.apply(color, timestamp, x, y)
 
+def darken_batch(colors, timestamp, xs, ys):
+    return [
+        (max(0, r - 40), max(0, g - 40), max(0, b - 40))
+        for r, g, b in colors
+    ]
+
 @register
 @background(30, 30, 30)
+@batched(darken_batch)
+@pure
 def darken(color, timestamp, x, y):
     return tuple(
         max(0, x - 40)
@@ -7,6 +7,7 @@ from layers import lighten
 from action import *
 from undo import UndoTracker
 from replay import ReplayTracker
+from journal import JournalWriter
 import time
 
 class MyWindow(arcade.Window):
@@ -25,6 +26,9 @@ class MyWindow(arcade.Window):
 
     BG = [255, 255, 255]
 
+    # If set, every paint, undo, redo and special is also appended to this journal file.
+    JOURNAL_PATH = None
+
     # SCAFFOLD PART
     # Unless you're adding new features, you shouldn't need to touch this.
 
@@ -97,6 +101,19 @@ class MyWindow(arcade.Window):
         self.special_button.center_x = self.DRAW_PANEL + self.LAYER_BUTTON_SIZE / 2
         self.special_button.center_y = 5 * self.LAYER_BUTTON_SIZE / 2
         self.action_buttons.append(self.special_button)
+        # Grid square sprites, recoloured in place as the grid changes.
+        self.grid_sprites = arcade.SpriteList()
+        for x in range(self.GRID_SIZE_X):
+            for y in range(self.GRID_SIZE_Y):
+                square = arcade.SpriteSolidColor(
+                    math.ceil(self.GRID_SQ_WIDTH),
+                    math.ceil(self.GRID_SQ_HEIGHT),
+                    arcade.color.WHITE,
+                )
+                square.center_x = self.GRID_SQ_WIDTH * (x + 0.5)
+                square.center_y = self.GRID_SQ_HEIGHT * (y + 0.5)
+                square.color = tuple(self.BG)
+                self.grid_sprites.append(square)
 
         self.on_reset()
 
@@ -125,15 +142,16 @@ class MyWindow(arcade.Window):
         # UI - Draw Modes / Action buttons
         self.action_buttons.draw()
         # Grid
-        for x in range(self.GRID_SIZE_X):
-            for y in range(self.GRID_SIZE_Y):
-                arcade.draw_lrtb_rectangle_filled(
-                    self.GRID_SQ_WIDTH * x,
-                    self.GRID_SQ_WIDTH * (x+1),
-                    self.GRID_SQ_HEIGHT * (y+1),
-                    self.GRID_SQ_HEIGHT * y,
-                    self.grid[x][y].get_color(self.BG[:], self.timestamp, x, y),
-                )
+        # Only squares touched since the last frame (or animated) are recomputed,
+        # and only their sprites have their colour updated.
+        frame = self.grid.render(self.timestamp, self.BG)
+        updated = self.grid.updated
+        if updated is None:
+            updated = [(x, y) for x in range(self.GRID_SIZE_X) for y in range(self.GRID_SIZE_Y)]
+        for x, y in updated:
+            offset = (x * self.GRID_SIZE_Y + y) * 3
+            self.grid_sprites[x * self.GRID_SIZE_Y + y].color = tuple(frame[offset:offset+3])
+        self.grid_sprites.draw()
 
     def on_mouse_press(self, x: int, y: int, button: int, modifiers: int) -> None:
         """Called when the mouse buttons are pressed."""
@@ -204,6 +222,11 @@ class MyWindow(arcade.Window):
     def on_key_press(self, symbol: int, modifiers: int) -> None:
         """Called when a keyboard key is pressed."""
         if not self.enable_ui:
+            # Seek through the replay while it plays.
+            if symbol == keys.RIGHT:
+                self.on_replay_seek(self.replay.position + ReplayTracker.SNAPSHOT_INTERVAL)
+            if symbol == keys.LEFT:
+                self.on_replay_seek(self.replay.position - ReplayTracker.SNAPSHOT_INTERVAL)
             return
         self.z_pressed = keys.Z == symbol and (modifiers & keys.MOD_CTRL)
         self.y_pressed = keys.Y == symbol and (modifiers & keys.MOD_CTRL)
@@ -293,6 +316,14 @@ class MyWindow(arcade.Window):
         """Initialisation that occurs after the system initialisation."""
         self.action = UndoTracker()
         self.replay = ReplayTracker()
+        # The journal stays open across resets, with each reset starting a new session.
+        journal = getattr(self, "journal", None)
+        path = getattr(self, "JOURNAL_PATH", None)
+        if journal is None and path is not None:
+            journal = JournalWriter(path)
+        self.journal = journal
+        if journal is not None and getattr(self, "grid", None) is not None:
+            journal.session(self.grid.draw_style)
 
     def on_reset(self):
         """Called when a window reset is requested."""
@@ -313,8 +344,8 @@ class MyWindow(arcade.Window):
         complexity = O(n^2)
         """
         
-        paint = PaintAction()
-        replay_paint = PaintAction()
+        paint = CompactPaintAction()
+        replay_paint = CompactPaintAction()
         
         size = self.grid.brush_size
         
@@ -326,13 +357,15 @@ class MyWindow(arcade.Window):
                     
                     layer_change = self.grid[x_coord][y_coord].add(layer)
                     if layer_change == True:
-                        replay_paint.add_step(PaintStep((x_coord,y_coord),layer))
-                    paint.add_step(PaintStep((x_coord,y_coord),layer))
+                        replay_paint.add(x_coord, y_coord, layer)
+                    paint.add(x_coord, y_coord, layer)
 
         
-        self.action.repaint.clear()
+        self.action.clear_redo()
         self.action.add_action(paint)
         self.replay.add_action(replay_paint)
+        if self.journal is not None:
+            self.journal.paint(replay_paint)
         
         
     def on_undo(self):
@@ -342,6 +375,8 @@ class MyWindow(arcade.Window):
         """
         layer_undone = self.action.undo(self.grid)
         self.replay.add_action(layer_undone, True)
+        if self.journal is not None and layer_undone is not None:
+            self.journal.undo(layer_undone)
         
 
     def on_redo(self):
@@ -351,12 +386,16 @@ class MyWindow(arcade.Window):
         """
         layer_redone = self.action.redo(self.grid)
         self.replay.add_action(layer_redone, False)
+        if self.journal is not None and layer_redone is not None:
+            self.journal.redo(layer_redone)
 
     def on_special(self):
         """Called when the special action is requested."""
         self.grid.special()
-        self.action.add_action(PaintAction(is_special=True))
-        self.replay.add_action(PaintAction(is_special=True))
+        self.action.add_action(CompactPaintAction(is_special=True))
+        self.replay.add_action(CompactPaintAction(is_special=True))
+        if self.journal is not None:
+            self.journal.special()
 
     def on_replay_start(self):
         """Called when the replay starting is requested."""
@@ -370,6 +409,10 @@ class MyWindow(arcade.Window):
         """
         return self.replay.play_next_action(self.grid)
 
+    def on_replay_seek(self, step: int):
+        """Called when the replay should jump to a given step."""
+        self.replay.seek(self.grid, step)
+
     def on_increase_brush_size(self):
         """Called when an increase to the brush size is requested."""
         self.grid.increase_brush_size()
@@ -378,6 +421,12 @@ class MyWindow(arcade.Window):
         """Called when a decrease to the brush size is requested."""
         self.grid.decrease_brush_size()
 
+    def on_close(self):
+        """Called when the window is closed. Makes sure the journal is written out."""
+        if self.journal is not None:
+            self.journal.close()
+        super().on_close()
+
 def main():
     """ Main function """
     window = MyWindow()
@@ -4,10 +4,24 @@ from grid import Grid
 from data_structures.queue_adt import CircularQueue
 
 class ReplayTracker:
-    
-    def __init__(self) -> None:
-        self.steps = CircularQueue(10000)
+    """
+    Records actions, and plays them back one at a time.
 
+    Actions are kept after being played, with position the number played
+    so far, so the replay can also seek to any step. While playing, the
+    grid is snapshotted every SNAPSHOT_INTERVAL steps; seeking restores the
+    nearest snapshot and plays at most SNAPSHOT_INTERVAL - 1 steps from it.
+    The grid is taken to start empty, as it does in the app, so the snapshot
+    at step 0 is known before anything is played.
+    """
+
+    MAX_ACTIONS = 10000
+    SNAPSHOT_INTERVAL = 250
+
+    def __init__(self) -> None:
+        self.steps = CircularQueue(self.MAX_ACTIONS)
+        self.position = 0
+        self.snapshots = {0: Grid.EMPTY_SNAPSHOT}
 
     def start_replay(self) -> None:
         """
@@ -26,25 +40,96 @@ class ReplayTracker:
         """
         self.steps.append([action, is_undo])
 
-    def play_next_action(self, grid: Grid) -> bool:
+    def __len__(self) -> int:
+        """The number of steps recorded."""
+        return len(self.steps)
+
+    def play_next_action(self, grid: Grid, snapshot: bool=True) -> bool:
         """
         Plays the next replay action on the grid.
         Returns a boolean.
             - If there were no more actions to play, and so nothing happened, return True.
             - Otherwise, return False.
+
+        If snapshot is False, the grid is not snapshotted for seek on the way.
         """
-        if self.steps.is_empty() == True:
+        if self.position >= len(self.steps):
             return True
-        next_replay = self.steps.serve()
-        # print(next_replay[1])
-        if next_replay[0] == None:
+        if snapshot and self.position % self.SNAPSHOT_INTERVAL == 0 and self.position not in self.snapshots:
+            self.snapshots[self.position] = grid.snapshot()
+        action, is_undo = self.steps[self.position]
+        self.position += 1
+        if action is None:
             return False
-        if next_replay[1] == True:
-            next_replay[0].undo_apply(grid)
+        if is_undo:
+            action.undo_apply(grid)
         else:
-            next_replay[0].redo_apply(grid)
+            action.redo_apply(grid)
         return False
 
+    def play_until(self, grid: Grid, n: int, every: int|None=None, on_frame=None, snapshot: bool=False) -> int:
+        """
+        Play steps back to back, without waiting between them, until n steps
+        have been played (or there are none left).
+
+        If every is given, on_frame(grid, position) is called after every
+        `every` steps, and once more at the end, so callers can render
+        just those frames rather than one per step.
+
+        The grid is only snapshotted for seek if snapshot is True,
+        as a replay played straight through never seeks.
+
+        :return: The new position.
+        """
+        n = min(n, len(self.steps))
+        while self.position < n:
+            self.play_next_action(grid, snapshot)
+            if every is not None and on_frame is not None and self.position % every == 0:
+                on_frame(grid, self.position)
+        if every is not None and on_frame is not None and self.position % every != 0:
+            on_frame(grid, self.position)
+        return self.position
+
+    def play_all(self, grid: Grid, every: int|None=None, on_frame=None, snapshot: bool=False) -> int:
+        """
+        Play every remaining step back to back. See play_until.
+        :return: The new position, which is the number of steps recorded.
+        """
+        return self.play_until(grid, len(self.steps), every, on_frame, snapshot)
+
+    def seek(self, grid: Grid, step: int) -> int:
+        """
+        Bring the grid to how it was after the first `step` steps were played.
+
+        Restores the latest snapshot at or before `step` if going back, or
+        if it is closer than the current position, then plays forward.
+
+        :return: The new position.
+        """
+        step = max(0, min(step, len(self.steps)))
+        snapshot = max(key for key in self.snapshots if key <= step)
+        if step < self.position or snapshot > self.position:
+            grid.restore(self.snapshots[snapshot])
+            self.position = snapshot
+        while self.position < step:
+            self.play_next_action(grid)
+        return self.position
+
+    def fast_forward(self, grid: Grid, count: int=SNAPSHOT_INTERVAL) -> int:
+        """Skip forward count steps. :return: The new position."""
+        return self.seek(grid, self.position + count)
+
+    def rewind(self, grid: Grid, count: int=SNAPSHOT_INTERVAL) -> int:
+        """Go back count steps. :return: The new position."""
+        return self.seek(grid, self.position - count)
+
+    def scrub(self, grid: Grid, fraction: float) -> int:
+        """
+        Seek to a fraction of the way through the replay, from 0 (the start) to 1 (the end).
+        :return: The new position.
+        """
+        return self.seek(grid, round(fraction * len(self.steps)))
+
 if __name__ == "__main__":
     action1 = PaintAction([], is_special=True)
     action2 = PaintAction([])
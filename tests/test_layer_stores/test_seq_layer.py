@@ -2,6 +2,7 @@ import unittest
 from ed_utils.decorators import number
 
 from layer_store import SequenceLayerStore
+from layer_util import get_layers
 from layers import black, lighten, rainbow, invert
 
 class TestSeqLayer(unittest.TestCase):
@@ -69,3 +70,27 @@ class TestSeqLayer(unittest.TestCase):
         self.assertEqual(s.get_color((100, 100, 100), 7, 0, 0), (0, 0, 0))
         s.erase(black)
         self.assertEqual(s.get_color((100, 100, 100), 7, 0, 0), (91, 214, 104))
+
+    @number("3.6")
+    def test_every_mask(self):
+        # The shared chain and special tables must agree with the plain rules
+        # for every combination of layers.
+        layers = [layer for layer in get_layers() if layer is not None]
+        for mask in range(1 << len(layers)):
+            applied = [layer for i, layer in enumerate(layers) if mask >> i & 1]
+            s = SequenceLayerStore()
+            for layer in reversed(applied):
+                s.add(layer)
+            self.assertEqual(
+                list(s.get_applied_layers()),
+                sorted(applied, key=lambda layer: layer.index),
+            )
+            s.special()
+            if applied:
+                by_name = sorted(applied, key=lambda layer: layer.name)
+                # With an even count, the lexicographically smaller median goes.
+                applied.remove(by_name[(len(by_name) - 1) // 2])
+            self.assertEqual(
+                list(s.get_applied_layers()),
+                sorted(applied, key=lambda layer: layer.index),
+            )
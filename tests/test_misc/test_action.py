@@ -0,0 +1,61 @@
+import unittest
+from ed_utils.decorators import number
+
+from action import CompactPaintAction, PaintAction, PaintStep
+from undo import UndoTracker
+from replay import ReplayTracker
+from layers import green, red, blue
+from grid import Grid
+
+class TestCompactAction(unittest.TestCase):
+
+    def assertGridEqual(self, grid1, grid2):
+        for x in range(grid1.x):
+            for y in range(grid1.y):
+                self.assertEqual(
+                    grid1[x][y].get_color((255, 255, 255), 0, x, y),
+                    grid2[x][y].get_color((255, 255, 255), 0, x, y),
+                )
+
+    @number("10.1")
+    def test_steps(self):
+        steps = [PaintStep((4, 4), green), PaintStep((1000, 70000), red), PaintStep((5, 4), blue)]
+        action = CompactPaintAction(steps)
+        self.assertEqual(len(action), 3)
+        self.assertEqual(action.steps, steps)
+        action.add(7, 8, red)
+        self.assertEqual(action.steps[-1], PaintStep((7, 8), red))
+        self.assertEqual(CompactPaintAction.from_action(PaintAction(steps)).steps, steps)
+        with self.assertRaises(AttributeError):
+            action.extra = 1
+
+    @number("10.2")
+    def test_apply(self):
+        grid = Grid(Grid.DRAW_STYLE_ADD, 10, 10)
+        control_grid = Grid(Grid.DRAW_STYLE_ADD, 10, 10)
+        steps = [PaintStep((4, 4), green), PaintStep((4, 5), red), PaintStep((4, 4), blue)]
+
+        undo = UndoTracker()
+        replay = ReplayTracker()
+        for action in (CompactPaintAction(steps), CompactPaintAction(is_special=True)):
+            action.redo_apply(grid)
+            undo.add_action(action)
+            replay.add_action(action)
+        for step in steps:
+            step.redo_apply(control_grid)
+        control_grid.special()
+        self.assertGridEqual(grid, control_grid)
+
+        undo.undo(grid)
+        undo.undo(grid)
+        self.assertGridEqual(grid, Grid(Grid.DRAW_STYLE_ADD, 10, 10))
+        undo.redo(grid)
+        control_grid.special()
+        self.assertGridEqual(grid, control_grid)
+
+        replay_grid = Grid(Grid.DRAW_STYLE_ADD, 10, 10)
+        replay.start_replay()
+        while not replay.play_next_action(replay_grid):
+            pass
+        control_grid.special()
+        self.assertGridEqual(replay_grid, control_grid)
@@ -0,0 +1,55 @@
+import os
+import struct
+import tempfile
+import unittest
+import zlib
+from ed_utils.decorators import number
+
+from layers import red, blue
+from grid import Grid
+from headless import image_bytes, write_ppm, write_png
+
+class TestHeadless(unittest.TestCase):
+
+    BG = (255, 255, 255)
+
+    def setUp(self):
+        self.grid = Grid(Grid.DRAW_STYLE_SET, 3, 2)
+        self.grid[0][0].add(red)
+        self.grid[2][1].add(blue)
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    @number("8.1")
+    def test_image_bytes(self):
+        white, r, b = bytes(self.BG), bytes((255, 0, 0)), bytes((0, 0, 255))
+        # Top row is y = 1, bottom row is y = 0.
+        self.assertEqual(image_bytes(self.grid, 0, self.BG), white + white + b + r + white + white)
+        scaled = image_bytes(self.grid, 0, self.BG, scale=2)
+        self.assertEqual(len(scaled), 6 * 4 * 3)
+        self.assertEqual(scaled[-18:], r + r + white * 4)
+
+    @number("8.2")
+    def test_ppm(self):
+        path = os.path.join(self.tmp.name, "frame.ppm")
+        write_ppm(path, self.grid, 0, self.BG)
+        with open(path, "rb") as f:
+            data = f.read()
+        self.assertEqual(data, b"P6\n3 2\n255\n" + image_bytes(self.grid, 0, self.BG))
+
+    @number("8.3")
+    def test_png(self):
+        path = os.path.join(self.tmp.name, "frame.png")
+        write_png(path, self.grid, 0, self.BG, scale=3)
+        with open(path, "rb") as f:
+            data = f.read()
+        self.assertEqual(data[:8], b"\x89PNG\r\n\x1a\n")
+        width, height = struct.unpack(">II", data[16:24])
+        self.assertEqual((width, height), (9, 6))
+        length = struct.unpack(">I", data[33:37])[0]
+        self.assertEqual(data[37:41], b"IDAT")
+        raw = zlib.decompress(data[41:41 + length])
+        pixels = b"".join(raw[row * 28 + 1:(row + 1) * 28] for row in range(6))
+        self.assertEqual(pixels, image_bytes(self.grid, 0, self.BG, scale=3))
@@ -0,0 +1,124 @@
+import os
+import tempfile
+import unittest
+from ed_utils.decorators import number
+
+from action import CompactPaintAction, PaintAction, PaintStep
+from journal import Journal, JournalWriter, PAINT, REDO, SPECIAL, UNDO
+from layers import blue, green, red
+from grid import Grid
+
+class TestJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "session.journal")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_session(self):
+        paint1 = CompactPaintAction([PaintStep((4, 4), green), PaintStep((300, 5), red)])
+        paint2 = PaintAction([PaintStep((5, 5), blue)])
+        with JournalWriter(self.path) as journal:
+            journal.paint(paint1)
+            journal.special()
+            journal.paint(paint2)
+            journal.undo(paint2)
+            journal.redo(paint2)
+            journal.undo(CompactPaintAction(is_special=True))
+        return paint1, paint2
+
+    @number("11.1")
+    def test_round_trip(self):
+        paint1, paint2 = self.write_session()
+        with Journal(self.path) as journal:
+            self.assertEqual(len(journal), 6)
+            self.assertEqual([journal[i][0] for i in range(6)], [PAINT, SPECIAL, PAINT, UNDO, REDO, UNDO])
+            self.assertEqual(journal[0][1].steps, paint1.steps)
+            self.assertTrue(journal[1][1].is_special)
+            self.assertEqual(journal[-2][1].steps, paint2.steps)
+            self.assertFalse(journal[-2][1].is_special)
+            self.assertTrue(journal[-1][1].is_special)
+            self.assertRaises(IndexError, journal.__getitem__, 6)
+
+        # Appending to an existing journal continues it.
+        big = CompactPaintAction([PaintStep((70000, 123456), red)])
+        with JournalWriter(self.path) as writer:
+            writer.paint(paint1)
+            writer.paint(big)
+        with Journal(self.path) as journal:
+            self.assertEqual(len(journal), 8)
+            self.assertEqual(journal[6][1].steps, paint1.steps)
+            self.assertEqual(journal[7][1].steps, big.steps)
+
+    @number("11.2")
+    def test_truncated(self):
+        paint1, _ = self.write_session()
+        size = os.path.getsize(self.path)
+        # The last record is 10 bytes long.
+        for cut in (1, 9, 10):
+            os.truncate(self.path, size - cut)
+            with Journal(self.path) as journal:
+                self.assertEqual(len(journal), 5)
+            os.remove(self.path)
+            self.write_session()
+
+        # A final record with bad contents is dropped too.
+        with open(self.path, "r+b") as f:
+            f.seek(-5, os.SEEK_END)
+            f.write(b"\xff")
+        with Journal(self.path) as journal:
+            self.assertEqual(len(journal), 5)
+
+        # New records replace the broken one.
+        with JournalWriter(self.path) as writer:
+            writer.paint(paint1)
+        with Journal(self.path) as journal:
+            self.assertEqual(len(journal), 6)
+            self.assertEqual(journal[5][1].steps, paint1.steps)
+
+        with open(self.path, "wb") as f:
+            f.write(b"nope")
+        self.assertRaises(ValueError, Journal, self.path)
+        self.assertRaises(ValueError, JournalWriter, self.path)
+
+    @number("11.3")
+    def test_replay(self):
+        self.write_session()
+        with Journal(self.path) as journal:
+            replay = journal.to_replay()
+        grid = Grid(Grid.DRAW_STYLE_SET, 400, 10)
+        replay.start_replay()
+        while not replay.play_next_action(grid):
+            pass
+        # The special was undone, so the grid just holds the paints.
+        self.assertEqual(grid[4][4].get_color((0, 0, 0), 0, 4, 4), (0, 255, 0))
+        self.assertEqual(grid[300][5].get_color((0, 0, 0), 0, 300, 5), (255, 0, 0))
+        self.assertEqual(grid[5][5].get_color((0, 0, 0), 0, 5, 5), (0, 0, 255))
+
+    @number("11.4")
+    def test_sessions(self):
+        paint1, paint2 = self.write_session()
+        with JournalWriter(self.path) as writer:
+            writer.session(Grid.DRAW_STYLE_ADD)
+            writer.paint(paint1)
+            writer.special()
+            writer.session(Grid.DRAW_STYLE_SEQUENCE)
+            writer.session(Grid.DRAW_STYLE_SET)
+            writer.paint(paint2)
+        with Journal(self.path) as journal:
+            self.assertEqual(journal.sessions(), [
+                (None, 0, 6),
+                (Grid.DRAW_STYLE_ADD, 7, 9),
+                (Grid.DRAW_STYLE_SEQUENCE, 10, 10),
+                (Grid.DRAW_STYLE_SET, 11, 12),
+            ])
+            self.assertEqual(len(journal.to_replay(0)), 6)
+            replay = journal.to_replay(1)
+            self.assertEqual(len(replay), 2)
+            self.assertEqual(replay.steps[0][0].steps, paint1.steps)
+            self.assertTrue(replay.steps[1][0].is_special)
+            self.assertEqual(len(journal.to_replay(2)), 0)
+            # By default, the latest session.
+            self.assertEqual(journal.to_replay().steps[0][0].steps, paint2.steps)
@@ -0,0 +1,158 @@
+import colorsys
+import unittest
+from ed_utils.decorators import number
+
+import layer_util
+from layer_util import ColorTable, compile_layers
+from layer_store import AdditiveLayerStore, SetLayerStore
+from layers import RAINBOW_RAMP, SPARKLE_JUMPS, sparkle_lightens, black, lighten, darken, invert, rainbow, red, sparkle
+
+class TestPipeline(unittest.TestCase):
+
+    COLORS = [(0, 0, 0), (255, 255, 255), (20, 130, 250), (39, 40, 216), (100, 1, 254)]
+
+    @number("9.1")
+    def test_fusion(self):
+        layers = [lighten, lighten, invert, sparkle, darken, invert, lighten, sparkle]
+        pipeline = compile_layers(layers)
+        self.assertEqual(len(pipeline), 4)
+        self.assertIsInstance(pipeline[0], ColorTable)
+        self.assertIs(pipeline[1], sparkle)
+        self.assertIsInstance(pipeline[2], ColorTable)
+        self.assertIs(pipeline[3], sparkle)
+        # Compiled pipelines are shared.
+        self.assertIs(compile_layers(list(layers)), pipeline)
+
+        for color in self.COLORS:
+            for timestamp, x, y in ((0, 0, 0), (7.5, 3, 11), (13, 20, 2)):
+                expected = color
+                for layer in layers:
+                    expected = layer.apply(expected, timestamp, x, y)
+                actual = color
+                for step in pipeline:
+                    actual = step.apply(actual, timestamp, x, y)
+                self.assertEqual(actual, expected)
+
+    @number("9.2")
+    def test_deep_stack(self):
+        s = AdditiveLayerStore()
+        for i in range(60):
+            s.add((lighten, darken, invert)[i * 7 % 3])
+        self.assertEqual(len(s.get_pipeline()), 1)
+        for color in self.COLORS:
+            expected = color
+            for layer in s.get_applied_layers():
+                expected = layer.apply(expected, 0, 0, 0)
+            self.assertEqual(s.get_color(color, 0, 0, 0), expected)
+
+    @number("9.3")
+    def test_set_special(self):
+        s = SetLayerStore()
+        s.add(lighten)
+        s.special()
+        self.assertEqual(len(s.get_pipeline()), 1)
+        self.assertEqual(s.get_color((100, 100, 100), 0, 0, 0), (115, 115, 115))
+
+    @number("9.4")
+    def test_algebra(self):
+        # Nothing before a constant layer matters.
+        self.assertEqual(compile_layers([lighten, sparkle, invert, red]), (red,))
+        pipeline = compile_layers([sparkle, black, lighten])
+        self.assertIs(pipeline[0], black)
+        self.assertIsInstance(pipeline[1], ColorTable)
+        # Adjacent inverts cancel, even once the layers between them cancel.
+        self.assertEqual(compile_layers([invert, invert]), ())
+        self.assertEqual(compile_layers([sparkle, invert, invert, sparkle]), (sparkle, sparkle))
+        self.assertEqual(len(compile_layers([invert, sparkle, invert])), 3)
+
+        for layers in ([lighten, sparkle, invert, rainbow, invert, invert, darken],
+                       [invert, invert, invert, sparkle, invert, invert]):
+            pipeline = compile_layers(layers)
+            for color in self.COLORS:
+                for timestamp, x, y in ((0, 0, 0), (7.5, 3, 11), (13, 20, 2)):
+                    expected = color
+                    for layer in layers:
+                        expected = layer.apply(expected, timestamp, x, y)
+                    actual = color
+                    for step in pipeline:
+                        actual = step.apply(actual, timestamp, x, y)
+                    self.assertEqual(actual, expected)
+
+    @number("9.5")
+    def test_hidden_animation(self):
+        s = AdditiveLayerStore()
+        s.add(sparkle)
+        s.add(rainbow)
+        self.assertTrue(s.is_time_dependent())
+        s.add(black)
+        # Black covers up both animated layers.
+        self.assertFalse(s.is_time_dependent())
+        self.assertEqual(s.get_color((10, 20, 30), 3, 1, 1), (0, 0, 0))
+
+    @number("9.6")
+    def test_sparkle_jumps(self):
+        for k, (a, c) in enumerate(SPARKLE_JUMPS):
+            v = 987654321
+            for _ in range(k):
+                v = (1103515245 * v + 12345) % (1 << 31)
+            self.assertEqual((a * 987654321 + c) % (1 << 31), v)
+
+        for timestamp in (0, 1/3, 7.5, 13, 1000.9):
+            for x in range(0, 60, 7):
+                for y in range(0, 60, 3):
+                    ts = int((timestamp + x/3 + y/5) * 3)
+                    other = x
+                    for _ in range(10 + (ts * 31 % 17)):
+                        other = (1103515245 * other + 12345) % (1 << 31)
+                    other += y
+                    for _ in range(10 + (ts * 31 % 17)):
+                        other = (1103515245 * other + 12345) % (1 << 31)
+                    expected = (other >> 16)/(1 << 15) < 0.1
+                    self.assertEqual(sparkle_lightens(timestamp, x, y), expected)
+
+    @number("9.7")
+    def test_rainbow_ramp(self):
+        xs = [x for x in range(25) for y in range(25)]
+        ys = [y for x in range(25) for y in range(25)]
+        for timestamp in (0, 0.3, 7, 13.01, 250.5):
+            batch = rainbow.apply_batch([(0, 0, 0)] * len(xs), timestamp, xs, ys)
+            for x, y, color in zip(xs, ys, batch):
+                self.assertEqual(rainbow.apply((0, 0, 0), timestamp, x, y), color)
+                # The ramp is within rounding of the exact hue.
+                exact = colorsys.hls_to_rgb((timestamp/20 + x/20 + y/20) % 1, 0.6, 0.6)
+                for c, e in zip(color, exact):
+                    self.assertLessEqual(abs(c - int(255*e)), 1)
+        self.assertIn(rainbow.apply((0, 0, 0), 3, 4, 5), RAINBOW_RAMP)
+
+    @number("9.8")
+    def test_deep_stack_reuse(self):
+        # Tables for single layers are worked out once, so a new deep stack
+        # is only composed from them, and never calls the layers again.
+        compile_layers([lighten, darken, invert])
+        calls = []
+        applies = {layer.index: layer.apply for layer in (lighten, darken, invert)}
+        def counted(apply):
+            def wrapped(*args):
+                calls.append(1)
+                return apply(*args)
+            return wrapped
+        try:
+            for layer in (lighten, darken, invert):
+                layer.apply = counted(applies[layer.index])
+            s = AdditiveLayerStore()
+            for i in range(99):
+                s.add((lighten, darken, invert)[i * 7 % 5 % 3])
+                s.get_color((20, 130, 250), 0, 0, 0)
+        finally:
+            for layer in (lighten, darken, invert):
+                layer.apply = applies[layer.index]
+        self.assertEqual(calls, [])
+
+    @number("9.9")
+    def test_pipeline_cache_bound(self):
+        for i in range(layer_util.MAX_PIPELINES + 10):
+            compile_layers([(lighten, darken)[int(b)] for b in bin(i)[2:]] + [sparkle])
+        self.assertEqual(len(layer_util.PIPELINES), layer_util.MAX_PIPELINES)
+        # The most recently used pipeline is kept.
+        pipeline = compile_layers([sparkle])
+        self.assertIs(compile_layers([sparkle]), pipeline)
@@ -0,0 +1,245 @@
+import unittest
+from ed_utils.decorators import number
+
+from layers import rainbow, lighten, black, invert, sparkle, darken, red
+from layer_util import get_layers
+from layer_store import SetLayerStore, AdditiveLayerStore, SequenceLayerStore
+from grid import Grid
+
+class TestRender(unittest.TestCase):
+
+    BG = (255, 255, 255)
+
+    @number("7.1")
+    def test_empty(self):
+        grid = Grid(Grid.DRAW_STYLE_SET, 4, 3)
+        frame = grid.render(0, self.BG)
+        self.assertEqual(len(frame), 4 * 3 * 3)
+        self.assertEqual(bytes(frame), bytes(self.BG) * 12)
+
+    @number("7.2")
+    def test_set(self):
+        grid = Grid(Grid.DRAW_STYLE_SET, 6, 5)
+        grid[1][2].add(rainbow)
+        grid[3][4].add(sparkle)
+        grid[5][0].add(lighten)
+        grid[0][0].add(black)
+        self.assertFrameMatches(grid, 3.7)
+        grid.special()
+        self.assertFrameMatches(grid, 11)
+
+    @number("7.3")
+    def test_add(self):
+        grid = Grid(Grid.DRAW_STYLE_ADD, 6, 5)
+        for x in range(6):
+            grid[x][x % 5].add(red)
+            grid[x][x % 5].add(lighten)
+            grid[x][(x+1) % 5].add(rainbow)
+            grid[x][(x+1) % 5].add(darken)
+            grid[x][(x+2) % 5].add(sparkle)
+            grid[x][(x+2) % 5].add(invert)
+        self.assertFrameMatches(grid, 0.4)
+        grid.special()
+        self.assertFrameMatches(grid, 7)
+        grid[2][2].erase(invert)
+        self.assertFrameMatches(grid, 19.25)
+
+    @number("7.4")
+    def test_sequence(self):
+        grid = Grid(Grid.DRAW_STYLE_SEQUENCE, 5, 5)
+        for x in range(5):
+            for y in range(5):
+                if (x + y) % 2 == 0:
+                    grid[x][y].add(rainbow)
+                if x % 2 == 0:
+                    grid[x][y].add(invert)
+                if y % 3 == 0:
+                    grid[x][y].add(sparkle)
+                grid[x][y].add(lighten)
+        self.assertFrameMatches(grid, 2.5)
+        grid.special()
+        self.assertFrameMatches(grid, 13)
+
+    @number("7.5")
+    def test_batched_layers(self):
+        colors = [(0, 0, 0), (255, 255, 255), (20, 130, 250), (39, 40, 216)] * 6
+        xs = [i % 7 for i in range(len(colors))]
+        ys = [i * 3 % 11 for i in range(len(colors))]
+        for layer in get_layers():
+            if layer is None:
+                break
+            for timestamp in (0, 1.3, 7):
+                self.assertEqual(
+                    layer.apply_batch(colors, timestamp, xs, ys),
+                    [layer.apply(c, timestamp, x, y) for c, x, y in zip(colors, xs, ys)],
+                    f"Batched {layer.name} differs from apply."
+                )
+
+    @number("7.6")
+    def test_color_cache(self):
+        for store in (SetLayerStore(), AdditiveLayerStore(), SequenceLayerStore()):
+            self.assertFalse(store.is_time_dependent())
+            store.add(lighten)
+            self.assertFalse(store.is_time_dependent())
+            self.assertEqual(store.get_color((100, 100, 100), 0, 0, 0), (140, 140, 140))
+            self.assertEqual(store.get_color((100, 100, 100), 5, 0, 0), (140, 140, 140))
+            store.erase(lighten)
+            self.assertEqual(store.get_color((100, 100, 100), 5, 0, 0), (100, 100, 100))
+            store.add(rainbow)
+            self.assertTrue(store.is_time_dependent())
+            self.assertNotEqual(
+                store.get_color((100, 100, 100), 0, 0, 0),
+                store.get_color((100, 100, 100), 5, 0, 0),
+            )
+
+    @number("7.7")
+    def test_dirty(self):
+        grid = Grid(Grid.DRAW_STYLE_ADD, 8, 8)
+        grid.render(0, self.BG)
+        self.assertIsNone(grid.updated)
+        grid.render(1, self.BG)
+        self.assertEqual(list(grid.updated), [])
+
+        grid[2][3].add(lighten)
+        grid[5][5].add(rainbow)
+        grid.render(2, self.BG)
+        self.assertEqual(set(grid.updated), {(2, 3), (5, 5)})
+        # Animated squares are redrawn every frame, static ones are not.
+        grid.render(3, self.BG)
+        self.assertEqual(list(grid.updated), [(5, 5)])
+        self.assertFrameMatches(grid, 4)
+
+        grid.special()
+        grid.render(5, self.BG)
+        self.assertIsNone(grid.updated)
+
+        # Squares are dirty when changed, not when indexed, even through a held reference.
+        square = grid[6][1]
+        grid[6][2].get_color(self.BG, 6, 6, 2)
+        grid.render(6, self.BG)
+        square.add(lighten)
+        grid.render(7, self.BG)
+        self.assertEqual(set(grid.updated), {(5, 5), (6, 1)})
+        self.assertFrameMatches(grid, 8)
+
+    @number("7.8")
+    def test_lazy_squares(self):
+        grid = Grid(Grid.DRAW_STYLE_SET, 1024, 1024)
+        self.assertEqual(grid.grid.count, 0)
+        grid[3][1000].add(red)
+        grid.special()
+        self.assertEqual(grid.grid.count, 1)
+        frame = grid.render(0, self.BG)
+        inverted = (0, 0, 0)
+        self.assertEqual(tuple(frame[:3]), inverted)
+        offset = (3 * 1024 + 1000) * 3
+        self.assertEqual(tuple(frame[offset:offset+3]), (0, 255, 255))
+        # Squares created after a special start out matching the rest.
+        self.assertEqual(grid[7][7].get_color(self.BG, 0, 7, 7), inverted)
+
+    @number("7.9")
+    def test_chunked_squares(self):
+        grid = Grid(Grid.DRAW_STYLE_SEQUENCE, 50000, 40000)
+        grid[0][0].add(red)
+        grid[31][31].add(red)
+        grid[49999][39999].add(red)
+        grid[49999][39999].add(invert)
+        self.assertEqual(len(grid.grid.tiles), 2)
+        self.assertEqual(grid.grid.count, 3)
+        self.assertEqual(
+            sorted(position for position, _ in grid.grid.items()),
+            [(0, 0), (31, 31), (49999, 39999)],
+        )
+        self.assertIsNone(grid.grid.get(32, 0))
+        self.assertEqual(grid.grid.get(49999, 39999).get_color(self.BG, 0, 0, 0), (255, 0, 0))
+        with self.assertRaises(IndexError):
+            grid[50000]
+        with self.assertRaises(IndexError):
+            grid[-50001]
+        with self.assertRaises(IndexError):
+            grid[0][40000]
+        self.assertIs(grid[-1][-1], grid.grid.get(49999, 39999))
+        # Iterating stops after the last column.
+        self.assertEqual(sum(1 for _ in Grid(Grid.DRAW_STYLE_SET, 4, 3)), 4)
+
+    @number("7.10")
+    def test_lazy_special(self):
+        for style in Grid.DRAW_STYLE_OPTIONS:
+            grid = Grid(style, 20000, 20000)
+            control = {
+                Grid.DRAW_STYLE_SET: SetLayerStore,
+                Grid.DRAW_STYLE_ADD: AdditiveLayerStore,
+                Grid.DRAW_STYLE_SEQUENCE: SequenceLayerStore,
+            }[style]()
+            for layer in (red, lighten, invert, darken):
+                grid[19999][5].add(layer)
+                control.add(layer)
+            for _ in range(3):
+                grid.special()
+                control.special()
+            self.assertEqual(grid.special_epoch, 3)
+            self.assertEqual(
+                grid[19999][5].get_color(self.BG, 0, 19999, 5),
+                control.get_color(self.BG, 0, 19999, 5),
+            )
+            grid[19999][5].add(black)
+            control.add(black)
+            grid.special()
+            control.special()
+            self.assertEqual(
+                grid[19999][5].get_color(self.BG, 0, 19999, 5),
+                control.get_color(self.BG, 0, 19999, 5),
+            )
+
+    @number("7.11")
+    def test_held_square_special(self):
+        for draw_style in Grid.DRAW_STYLE_OPTIONS:
+            grid = Grid(draw_style, 3, 3)
+            control = grid.new_square()
+            control.owner = None
+            square = grid[1][1]
+            for layer in (red, lighten):
+                square.add(layer)
+                control.add(layer)
+            grid.special()
+            control.special()
+            # A reference held across special sees it, and reading does not change the store.
+            self.assertEqual(square.get_color(self.BG, 0, 1, 1), control.get_color(self.BG, 0, 1, 1))
+            self.assertEqual(square.get_state(), control.get_state())
+            self.assertEqual(square.epoch, 0)
+            square.add(black)
+            control.add(black)
+            self.assertEqual(grid[1][1].get_color(self.BG, 0, 1, 1), control.get_color(self.BG, 0, 1, 1))
+            self.assertFrameMatches(grid, 0)
+
+    @number("7.12")
+    def test_kept_groups(self):
+        grid = Grid(Grid.DRAW_STYLE_ADD, 6, 6)
+        for x in range(6):
+            for y in range(6):
+                grid[x][y].add(rainbow if (x + y) % 2 else sparkle)
+        self.assertFrameMatches(grid, 1)
+        self.assertEqual(len(grid.groups), 2)
+        # Moving squares between groups, out of every group, and into a new one.
+        grid[0][1].add(darken)
+        grid[0][0].erase(sparkle)
+        grid[1][1].add(lighten)
+        self.assertFrameMatches(grid, 2)
+        self.assertEqual(len(grid.groups), 4)
+        self.assertFrameMatches(grid, 3)
+        grid[0][1].erase(rainbow)
+        grid[0][1].erase(darken)
+        self.assertFrameMatches(grid, 4)
+        self.assertEqual(len(grid.groups), 3)
+        self.assertEqual(len(grid.animated), 34)
+
+    def assertFrameMatches(self, grid: Grid, timestamp):
+        frame = grid.render(timestamp, self.BG)
+        for x in range(grid.x):
+            for y in range(grid.y):
+                offset = (x * grid.y + y) * 3
+                self.assertEqual(
+                    tuple(frame[offset:offset+3]),
+                    tuple(grid[x][y].get_color(self.BG, timestamp, x, y)),
+                    "Rendered frame differs from get_color."
+                )
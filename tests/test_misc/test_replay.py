@@ -1,7 +1,7 @@
 import unittest
 from ed_utils.decorators import number
 
-from action import PaintAction, PaintStep
+from action import CompactPaintAction, PaintAction, PaintStep
 from replay import ReplayTracker
 from layers import blue, green, red, invert
 from grid import Grid
@@ -102,6 +102,77 @@ class TestReplay(unittest.TestCase):
         self.assertGridEqual(grid, control_grid)
         self.assertEqual(replay.play_next_action(grid), True) # Finished.
 
+    @number("5.4")
+    def test_seek(self):
+        layers = [blue, green, red, invert]
+        for draw_style in Grid.DRAW_STYLE_OPTIONS:
+            replay = ReplayTracker()
+            for i in range(600):
+                if i % 37 == 36:
+                    replay.add_action(PaintAction(is_special=True))
+                elif i % 11 == 10:
+                    replay.add_action(replay.steps[i - 1][0], is_undo=True)
+                else:
+                    replay.add_action(PaintAction([PaintStep((i % 10, i * 7 % 10), layers[i % 4])]))
+
+            def played(n):
+                control_grid = Grid(draw_style, 10, 10)
+                control = ReplayTracker()
+                for j in range(n):
+                    control.add_action(*replay.steps[j])
+                while not control.play_next_action(control_grid):
+                    pass
+                return control_grid
+
+            grid = Grid(draw_style, 10, 10)
+            replay.start_replay()
+            self.assertEqual(replay.seek(grid, 520), 520)
+            self.assertEqual(sorted(replay.snapshots), [0, 250, 500])
+            self.assertGridEqual(grid, played(520))
+            for step in (260, 3, 599, 501):
+                self.assertEqual(replay.seek(grid, step), step)
+                self.assertGridEqual(grid, played(step))
+            self.assertEqual(replay.rewind(grid, 100), 401)
+            self.assertGridEqual(grid, played(401))
+            self.assertEqual(replay.scrub(grid, 0.5), 300)
+            self.assertGridEqual(grid, played(300))
+            self.assertEqual(replay.fast_forward(grid, 1000), 600)
+            self.assertEqual(replay.play_next_action(grid), True)
+            self.assertGridEqual(grid, played(600))
+
+    @number("5.5")
+    def test_play_all(self):
+        replay = ReplayTracker()
+        control = ReplayTracker()
+        for i in range(250):
+            if i % 23 == 22:
+                action = [CompactPaintAction(is_special=True), False]
+            elif i % 9 == 8:
+                action = [replay.steps[i - 1][0], True]
+            else:
+                action = [CompactPaintAction([PaintStep((i % 10, j), [blue, green, red, invert][(i + j) % 4]) for j in range(i % 4)]), False]
+            replay.add_action(*action)
+            control.add_action(*action)
+
+        replay.SNAPSHOT_INTERVAL = 100
+        grid = Grid(Grid.DRAW_STYLE_ADD, 10, 10)
+        control_grid = Grid(Grid.DRAW_STYLE_ADD, 10, 10)
+        frames = []
+        self.assertEqual(replay.play_until(grid, 40), 40)
+        self.assertEqual(replay.play_all(grid, every=100, on_frame=lambda g, n: frames.append((n, g.render(0, (0, 0, 0))[:]))), 250)
+        self.assertEqual([n for n, _ in frames], [100, 200, 250])
+        self.assertTrue(replay.play_next_action(grid))
+        # Nothing is snapshotted unless asked for, and seeking back still works.
+        self.assertEqual(sorted(replay.snapshots), [0])
+        self.assertEqual(replay.seek(grid, 40), 40)
+        self.assertEqual(replay.play_all(grid, snapshot=True), 250)
+        self.assertEqual(sorted(replay.snapshots), [0, 100, 200])
+
+        while not control.play_next_action(control_grid):
+            pass
+        self.assertGridEqual(grid, control_grid)
+        self.assertEqual(frames[-1][1], control_grid.render(0, (0, 0, 0)))
+
     def assertGridEqual(self, grid1: Grid, grid2: Grid):
         for x in range(len(grid1.grid)):
             for y in range(len(grid1[x])):
@@ -3,7 +3,7 @@ from ed_utils.decorators import number
 
 from action import PaintAction, PaintStep
 from undo import UndoTracker
-from layers import green, red, blue
+from layers import green, red, blue, lighten, invert
 from grid import Grid
 
 class TestUndo(unittest.TestCase):
@@ -76,3 +76,133 @@ class TestUndo(unittest.TestCase):
                     "Grid not the same after apply has been made."
                 )
 
+
+    @number("4.2")
+    def test_evict_oldest(self):
+        grid = Grid(Grid.DRAW_STYLE_SET, 10, 10)
+        undo = UndoTracker(max_steps=6)
+        actions = [PaintAction([PaintStep((i, j), green) for j in range(2)]) for i in range(5)]
+        for action in actions:
+            action.redo_apply(grid)
+            undo.add_action(action)
+        # Only the newest three actions fit in 6 steps.
+        self.assertEqual(undo.footprint, 6)
+        self.assertEqual(len(undo.paint), 3)
+        for action in reversed(actions[2:]):
+            self.assertIs(undo.undo(grid), action)
+        self.assertIsNone(undo.undo(grid))
+        self.assertEqual(grid[1][1].get_color((0, 0, 0), 0, 1, 1), (0, 255, 0))
+        self.assertEqual(grid[2][1].get_color((0, 0, 0), 0, 2, 1), (0, 0, 0))
+
+        # Redo history counts towards the budget until it is cleared.
+        self.assertIs(undo.redo(grid), actions[2])
+        self.assertEqual(undo.footprint, 6)
+        undo.clear_redo()
+        self.assertEqual(undo.footprint, 2)
+
+        # An action too large for the whole budget is not kept.
+        undo.add_action(PaintAction([PaintStep((0, j), red) for j in range(7)]))
+        self.assertEqual(len(undo.paint), 1)
+
+    @number("4.3")
+    def test_action_limit(self):
+        grid = Grid(Grid.DRAW_STYLE_SET, 10, 10)
+        undo = UndoTracker(max_actions=4)
+        for i in range(10):
+            undo.add_action(PaintAction([PaintStep((i, 0), blue)]))
+        undo.add_action(PaintAction(is_special=True))
+        self.assertEqual(len(undo.paint), 4)
+        self.assertEqual(undo.footprint, 4)
+        self.assertTrue(undo.undo(grid).is_special)
+        self.assertEqual(undo.undo(grid).steps, [PaintStep((9, 0), blue)])
+        # Redo history counts towards the limit, so the oldest actions go first.
+        undo.add_action(PaintAction([PaintStep((0, 0), red)]))
+        undo.add_action(PaintAction([PaintStep((1, 0), red)]))
+        self.assertEqual(len(undo.paint) + len(undo.repaint), 4)
+        self.assertEqual(undo.undo(grid).steps, [PaintStep((1, 0), red)])
+        self.assertEqual(undo.undo(grid).steps, [PaintStep((0, 0), red)])
+        self.assertIsNone(undo.undo(grid))
+
+    @number("4.4")
+    def test_checkpoints(self):
+        def make_actions():
+            actions = []
+            for i in range(130):
+                if i % 17 == 16:
+                    actions.append(PaintAction(is_special=True))
+                else:
+                    layer = (red, lighten, invert, blue)[i % 4]
+                    steps = [PaintStep((i % 7, (i * 3) % 5), layer)]
+                    if i % 3 == 0:
+                        steps.append(PaintStep((3, 3), layer))
+                    actions.append(PaintAction(steps))
+            return actions
+
+        for draw_style in Grid.DRAW_STYLE_OPTIONS:
+            actions = make_actions()
+            grid = Grid(draw_style, 8, 8)
+            undo = UndoTracker()
+            for action in actions:
+                action.redo_apply(grid)
+                undo.add_action(action, grid)
+            self.assertEqual(sorted(undo.checkpoints), [0, 50, 100])
+
+            for n in (120, 100, 75):
+                undo.undo_to(grid, n)
+                self.assertEqual(len(undo.paint), n)
+                control = Grid(draw_style, 8, 8)
+                for action in actions[:n]:
+                    action.redo_apply(control)
+                self.assertGridEqual(grid, control)
+            # The empty grid the history started from is a checkpoint too.
+            self.assertEqual(undo.undo_to(grid, 3), 72)
+            control = Grid(draw_style, 8, 8)
+            for action in actions[:3]:
+                action.redo_apply(control)
+            self.assertGridEqual(grid, control)
+
+            self.assertEqual(undo.redo_to(grid, 110), 107)
+            control = Grid(draw_style, 8, 8)
+            for action in actions[:110]:
+                action.redo_apply(control)
+            self.assertGridEqual(grid, control)
+            self.assertEqual(len(undo.repaint), 20)
+
+            # A new action replaces the redo history, and the checkpoints in it.
+            undo.clear_redo()
+            undo.add_action(PaintAction([PaintStep((0, 0), green)]), grid)
+            self.assertEqual(sorted(undo.checkpoints), [0, 50, 100])
+
+    @number("4.5")
+    def test_long_history_checkpoints(self):
+        applied = []
+
+        class CountedAction(PaintAction):
+            def undo_apply(self, grid):
+                applied.append(self)
+                PaintAction.undo_apply(self, grid)
+
+            def redo_apply(self, grid):
+                applied.append(self)
+                PaintAction.redo_apply(self, grid)
+
+        actions = [
+            CountedAction([PaintStep((i % 8, (i // 8) % 8), (red, blue, lighten)[i % 3])])
+            for i in range(3000)
+        ]
+        grid = Grid(Grid.DRAW_STYLE_SEQUENCE, 8, 8)
+        undo = UndoTracker()
+        for action in actions:
+            action.redo_apply(grid)
+            undo.add_action(action, grid)
+        # Thinned out rather than dropped, so they still reach back to the start.
+        self.assertLessEqual(len(undo.checkpoints), UndoTracker.MAX_CHECKPOINTS)
+        self.assertEqual(sorted(undo.checkpoints), list(range(0, 3001, undo.checkpoint_interval)))
+
+        applied.clear()
+        self.assertEqual(undo.undo_to(grid, 10), 2990)
+        self.assertEqual(len(applied), 10)
+        control = Grid(Grid.DRAW_STYLE_SEQUENCE, 8, 8)
+        for action in actions[:10]:
+            action.redo_apply(control)
+        self.assertGridEqual(grid, control)
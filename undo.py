@@ -1,26 +1,103 @@
 from __future__ import annotations
-from action import PaintAction
+from action import CompactPaintAction, PaintAction
 from grid import Grid
+from data_structures.queue_adt import CircularQueue
 from data_structures.stack_adt import ArrayStack
 
+def action_size(action: PaintAction|CompactPaintAction) -> int:
+    """
+    The number of steps an action holds, which is what it costs to keep.
+    Special actions have no steps, but still count as one.
+    """
+    if action.is_special:
+        return 1
+    if isinstance(action, CompactPaintAction):
+        return max(1, len(action))
+    return max(1, len(action.steps))
+
 class UndoTracker:
-    
-    def __init__(self) -> None:
-        self.paint = ArrayStack(10000)
-        self.repaint = ArrayStack(10000)
+    """
+    Undo history, bounded both by number of actions and by total steps held.
+
+    paint is a ring of the actions that can be undone, oldest at the front,
+    and repaint a stack of the actions that can be redone.
+    Once the history goes over budget the oldest actions are forgotten first.
+
+    Given the grid, add_action also snapshots it every checkpoint_interval
+    actions, so undo_to and redo_to can jump far through the history.
+    Checkpoints are keyed by position: the number of actions applied since
+    the tracker was created, including those forgotten since. The grid is
+    taken to start empty, as it does in the app, so position 0 is a
+    checkpoint until the first action is forgotten.
+
+    Once there are more than MAX_CHECKPOINTS, every other one is dropped and
+    the interval doubles, so the checkpoints stay evenly spread over the
+    whole history however long it grows.
+    """
+
+    MAX_ACTIONS = 10000
+    MAX_STEPS = 1000000
+    CHECKPOINT_INTERVAL = 50
+    MAX_CHECKPOINTS = 16
+
+    def __init__(self, max_steps: int=MAX_STEPS, max_actions: int=MAX_ACTIONS) -> None:
+        self.max_steps = max_steps
+        self.max_actions = max_actions
+        self.paint = CircularQueue(max_actions)
+        self.repaint = ArrayStack(max_actions)
+        self.footprint = 0
+        self.forgotten = 0
+        self.checkpoint_interval = self.CHECKPOINT_INTERVAL
+        self.checkpoints = {0: Grid.EMPTY_SNAPSHOT}
 
-    def add_action(self, action: PaintAction) -> None:
+    def position(self) -> int:
+        """The position of the grid in the history, counting forgotten actions."""
+        return self.forgotten + len(self.paint)
+
+    def add_action(self, action: PaintAction|CompactPaintAction, grid: Grid|None=None) -> None:
         """
         Adds an action to the undo tracker.
 
-        If your collection is already full,
-        feel free to exit early and not add the action.
+        If the history is over budget, the oldest actions are forgotten
+        to make room. If that is not enough, anything left to redo is
+        forgotten too, and an action too large for the budget by itself
+        is not added at all.
+
+        grid is the grid with action already applied. If given, it is
+        snapshotted every checkpoint_interval actions.
         """
-        if self.paint.is_full():
+        size = action_size(action)
+        if size > self.max_steps:
             return None
-        self.paint.push(action)
-        
-    def undo(self, grid: Grid) -> PaintAction|None:
+        while not self.paint.is_empty() and self._over_budget(size):
+            self.footprint -= action_size(self.paint.serve())
+            self.forgotten += 1
+        if self._over_budget(size):
+            self.clear_redo()
+        self.paint.append(action)
+        self.footprint += size
+
+        position = self.position()
+        for key in list(self.checkpoints):
+            # Checkpoints before the oldest action can no longer be used,
+            # and those from here on were of a history that has been replaced.
+            if key < self.forgotten or key >= position:
+                del self.checkpoints[key]
+        if grid is not None and position % self.checkpoint_interval == 0:
+            self.checkpoints[position] = grid.snapshot()
+            if len(self.checkpoints) > self.MAX_CHECKPOINTS:
+                self.checkpoint_interval *= 2
+                for key in list(self.checkpoints):
+                    if key % self.checkpoint_interval != 0:
+                        del self.checkpoints[key]
+
+    def _over_budget(self, size: int) -> bool:
+        return (
+            len(self.paint) + len(self.repaint) >= self.max_actions
+            or self.footprint + size > self.max_steps
+        )
+
+    def undo(self, grid: Grid) -> PaintAction|CompactPaintAction|None:
         """
         Undo an operation, and apply the relevant action to the grid.
         If there are no actions to undo, simply do nothing.
@@ -29,13 +106,12 @@ class UndoTracker:
         """
         if self.paint.is_empty():
             return None
-        layer_undo = self.paint.pop()
+        layer_undo = self.paint.serve_rear()
         self.repaint.push(layer_undo)
         layer_undo.undo_apply(grid)
         return layer_undo
-        
 
-    def redo(self, grid: Grid) -> PaintAction|None:
+    def redo(self, grid: Grid) -> PaintAction|CompactPaintAction|None:
         """
         Redo an operation that was previously undone.
         If there are no actions to redo, simply do nothing.
@@ -45,6 +121,74 @@ class UndoTracker:
         if self.repaint.is_empty():
             return None
         layer_redo = self.repaint.pop()
-        self.paint.push(layer_redo)
+        self.paint.append(layer_redo)
         layer_redo.redo_apply(grid)
         return layer_redo
+
+    def clear_redo(self) -> None:
+        """Forget everything that could be redone, as a new action replaces it."""
+        while not self.repaint.is_empty():
+            self.footprint -= action_size(self.repaint.pop())
+        position = self.position()
+        for key in list(self.checkpoints):
+            if key > position:
+                del self.checkpoints[key]
+
+    def _checkpoint_between(self, low: int, high: int) -> int|None:
+        """The latest checkpoint position in [low, high], or None."""
+        usable = [key for key in self.checkpoints if low <= key <= high]
+        return max(usable) if usable else None
+
+    def _replay_from(self, grid: Grid, checkpoint: int, n: int) -> None:
+        """Restore a checkpoint, then redo the undo history after it up to n actions."""
+        grid.restore(self.checkpoints[checkpoint])
+        for i in range(checkpoint - self.forgotten, n):
+            self.paint[i].redo_apply(grid)
+
+    def undo_to(self, grid: Grid, n: int) -> int:
+        """
+        Undo until only n actions are left to undo.
+
+        Restores the latest checkpoint at or before that point and redoes
+        the few actions after it, rather than undoing every action in
+        between. The grid ends up as it was when the nth action was added.
+        Without a checkpoint, undoes one action at a time as undo does.
+
+        :return: The number of actions undone.
+        """
+        n = max(0, n)
+        count = len(self.paint) - n
+        if count <= 0:
+            return 0
+        checkpoint = self._checkpoint_between(self.forgotten, self.forgotten + n)
+        if checkpoint is None:
+            for _ in range(count):
+                self.undo(grid)
+            return count
+        for _ in range(count):
+            self.repaint.push(self.paint.serve_rear())
+        self._replay_from(grid, checkpoint, n)
+        return count
+
+    def redo_to(self, grid: Grid, n: int) -> int:
+        """
+        Redo until n actions can be undone (or there is nothing left to redo).
+
+        Jumps to the latest checkpoint on the way, if there is one,
+        and redoes only the actions after it.
+
+        :return: The number of actions redone.
+        """
+        count = min(n - len(self.paint), len(self.repaint))
+        if count <= 0:
+            return 0
+        start = self.position()
+        checkpoint = self._checkpoint_between(start + 1, start + count)
+        if checkpoint is None:
+            for _ in range(count):
+                self.redo(grid)
+            return count
+        for _ in range(count):
+            self.paint.append(self.repaint.pop())
+        self._replay_from(grid, checkpoint, len(self.paint))
+        return count